@@ -0,0 +1,323 @@
+# bench/bench_render.py
+"""
+图片生成性能测试。
+用 assets 里自带的 Basemap.png 和本地生成的假头像驱动 RankImageGenerator / ProfileImageGenerator，
+不访问网络；按行数、模糊半径、背景尺寸组合出多个场景，
+每个场景在独立子进程中运行，统计 p50/p95 耗时、峰值内存（RSS）和输出图片大小，结果写成 JSON。
+
+用法（在插件根目录下）：
+    python bench/bench_render.py                          # 全部场景，结果写入 bench/results/
+    python bench/bench_render.py -k rank -n 30            # 只跑名称包含 rank 的场景，每个 30 次
+    python bench/bench_render.py --format JPEG --cold     # JPEG 输出；每次都清空背景和头像缓存
+    python bench/bench_render.py --compare old.json       # 与之前的结果对比，变慢超过阈值时返回 1
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from io import BytesIO
+from multiprocessing import get_context
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PLUGIN_DIR not in sys.path:
+    sys.path.insert(0, PLUGIN_DIR)
+
+try:
+    from astrbot.api import logger
+except ImportError:
+    # 脱离 AstrBot 单独运行时，给 coer 提供一个标准 logging 的 logger
+    logger = logging.getLogger("bench_render")
+    _api = types.ModuleType("astrbot.api")
+    _api.logger = logger
+    _astrbot = types.ModuleType("astrbot")
+    _astrbot.__path__ = []
+    _astrbot.api = _api
+    sys.modules.setdefault("astrbot", _astrbot)
+    sys.modules.setdefault("astrbot.api", _api)
+
+import PIL
+from PIL import Image
+
+from coer.image_assets import EncodeOptions, clear_background_cache
+from coer.profile_generator import ProfileImageGenerator
+from coer.rank_manager import RankImageGenerator
+from coer.render_cache import RenderCache
+from coer.render_pool import RenderPool
+from coer.temp_storage import TempStorage
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RESULT_VERSION = 1
+DEFAULT_SIZE = (1640, 856)
+RESULTS_DIR = os.path.join(PLUGIN_DIR, "bench", "results")
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    # rank / menu / profile
+    kind: str
+    lines: int = 0
+    blur: int = 0
+    size: Tuple[int, int] = DEFAULT_SIZE
+
+
+def default_scenarios() -> List[Scenario]:
+    scenarios = []
+    for lines in (5, 15, 30):
+        scenarios.append(Scenario(f"rank-{lines}lines-blur0", "rank", lines, 0))
+    for blur in (2, 5):
+        scenarios.append(Scenario(f"rank-15lines-blur{blur}", "rank", 15, blur))
+    for lines in (10, 25):
+        for blur in (0, 2):
+            scenarios.append(Scenario(f"menu-{lines}lines-blur{blur}", "menu", lines, blur))
+    for blur in (0, 2, 5):
+        scenarios.append(Scenario(f"profile-blur{blur}", "profile", 0, blur))
+    for size in ((1280, 668), (2460, 1284)):
+        tag = f"{size[0]}x{size[1]}"
+        scenarios.append(Scenario(f"rank-15lines-blur2-{tag}", "rank", 15, 2, size))
+        scenarios.append(Scenario(f"profile-blur2-{tag}", "profile", 0, 2, size))
+    return scenarios
+
+
+def fake_avatar(seed: int) -> bytes:
+    """640x640 渐变 JPEG，和 QQ 头像接口返回的尺寸一致；seed 不同则内容（哈希）不同"""
+    img = Image.linear_gradient("L").resize((640, 640)).convert("RGB")
+    img.putpixel((0, 0), (seed % 256, (seed // 256) % 256, 7))
+    buf = BytesIO()
+    img.save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def rank_lines(count: int) -> List[str]:
+    return [f"{i}. 群成员{i:03d} - {10000 - i * 37}积分" for i in range(1, count + 1)]
+
+
+def menu_lines(count: int) -> List[str]:
+    lines = []
+    for i in range(1, count + 1):
+        # 和真实菜单一样每隔几行留一个空行分组
+        lines.append("" if i % 6 == 0 else f"🔹 命令{i:02d} — 功能说明文字")
+    return lines
+
+
+def rss_mb() -> Optional[float]:
+    """进程到目前为止的峰值 RSS（MB）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位是 KB，macOS 是字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(samples: List[float], pct: int) -> float:
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1]
+
+
+async def _run_scenario(scenario: Scenario, iterations: int, warmup: int, encoding: EncodeOptions,
+                        cold: bool, bg_file: str, font_file: str) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench_render_") as data_dir:
+        pool = RenderPool(workers=1, queue_size=1)
+        temp_storage = TempStorage(os.path.join(data_dir, "temp"))
+        config = SimpleNamespace(title_color="#000000", text_color="#333333")
+        if scenario.kind == "profile":
+            gen = ProfileImageGenerator(PLUGIN_DIR, data_dir, bg_file, font_file, blur_radius=scenario.blur,
+                                        render_pool=pool, temp_storage=temp_storage, encoding=encoding)
+        else:
+            # 关闭渲染缓存，否则除第一次外测到的都是缓存命中
+            gen = RankImageGenerator(PLUGIN_DIR, data_dir, bg_file, font_file, render_pool=pool,
+                                     render_cache=RenderCache(max_bytes=0), temp_storage=temp_storage,
+                                     encoding=encoding)
+        gen.bg_size = tuple(scenario.size)
+        # 冷启动模式下每次用不同的头像，避免命中圆形头像贴图缓存
+        avatars = [fake_avatar(i if cold else 0) for i in range(warmup + iterations)]
+
+        async def render(i: int):
+            if scenario.kind == "rank":
+                return await gen.create_rank_image(
+                    "🏆 积分排行榜", rank_lines(scenario.lines), scenario.lines, scenario.blur,
+                    config.title_color, config.text_color
+                )
+            if scenario.kind == "menu":
+                return await gen.create_menu_image(
+                    "📋 功能菜单", menu_lines(scenario.lines), scenario.blur, config.title_color, config.text_color
+                )
+            return await gen.create_profile_image(
+                "123456789", "性能测试用户", 12345, 67, [], {"points_rank": 3, "sign_rank": 5}, config,
+                "10000", assets=("✨ 今日份的寄语 ✨", avatars[i])
+            )
+
+        rss_before = rss_mb()
+        samples = []
+        output_bytes = 0
+        try:
+            for i in range(warmup + iterations):
+                if cold:
+                    clear_background_cache()
+                start = time.perf_counter()
+                data = await render(i)
+                elapsed = (time.perf_counter() - start) * 1000
+                if not data:
+                    raise RuntimeError(f"{scenario.name} 渲染失败")
+                if i >= warmup:
+                    samples.append(elapsed)
+                    output_bytes = len(data)
+        finally:
+            pool.shutdown()
+
+    peak = rss_mb()
+    return {
+        "scenario": asdict(scenario),
+        "iterations": iterations,
+        "latency_ms": {
+            "p50": round(percentile(samples, 50), 2),
+            "p95": round(percentile(samples, 95), 2),
+            "mean": round(statistics.fmean(samples), 2),
+            "min": round(min(samples), 2),
+            "max": round(max(samples), 2),
+        },
+        "rss_before_mb": None if rss_before is None else round(rss_before, 1),
+        "peak_rss_mb": None if peak is None else round(peak, 1),
+        "output_bytes": output_bytes,
+    }
+
+
+def run_scenario(scenario: Scenario, iterations: int, warmup: int, encoding: EncodeOptions,
+                 cold: bool, bg_file: str, font_file: str) -> dict:
+    # 字体缺失等提示每个子进程都会打印一次，测试时只保留错误
+    logging.basicConfig(level=logging.ERROR)
+    return asyncio.run(_run_scenario(scenario, iterations, warmup, encoding, cold, bg_file, font_file))
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PLUGIN_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def print_table(results: List[dict]):
+    print(f"{'场景':<34}{'p50(ms)':>10}{'p95(ms)':>10}{'峰值RSS(MB)':>14}{'输出(KB)':>10}")
+    for r in results:
+        lat = r["latency_ms"]
+        rss = "-" if r["peak_rss_mb"] is None else f"{r['peak_rss_mb']:.1f}"
+        print(f"{r['scenario']['name']:<34}{lat['p50']:>10.1f}{lat['p95']:>10.1f}{rss:>14}"
+              f"{r['output_bytes'] / 1024:>10.1f}")
+
+
+def compare(results: List[dict], baseline_path: str, threshold: float) -> bool:
+    """打印与基线的对比；任一场景 p50 变慢超过 threshold 倍时返回 False"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    old = {r["scenario"]["name"]: r for r in baseline.get("results", [])}
+    print(f"\n对比基线 {baseline_path}（{baseline.get('meta', {}).get('git', '?')}）")
+    ok = True
+    for r in results:
+        name = r["scenario"]["name"]
+        if name not in old:
+            print(f"{name:<34}基线中没有该场景")
+            continue
+        ratio = r["latency_ms"]["p50"] / max(old[name]["latency_ms"]["p50"], 1e-6)
+        size_delta = r["output_bytes"] - old[name]["output_bytes"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  <-- 变慢"
+            ok = False
+        print(f"{name:<34}p50 x{ratio:.2f}  输出 {size_delta:+d} 字节{flag}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="图片生成性能测试")
+    parser.add_argument("-n", "--iterations", type=int, default=20, help="每个场景计时的次数（默认20）")
+    parser.add_argument("--warmup", type=int, default=2, help="每个场景开始计时前的预热次数（默认2）")
+    parser.add_argument("-k", "--filter", default="", help="只运行名称包含该字符串的场景")
+    parser.add_argument("--format", default="PNG", help="输出格式 PNG/JPEG/WEBP（默认PNG）")
+    parser.add_argument("--quality", type=int, default=85, help="JPEG/WebP 质量（默认85）")
+    parser.add_argument("--scale", type=float, default=1.0, help="输出缩放比例（默认1.0）")
+    parser.add_argument("--cold", action="store_true", help="每次渲染前清空背景缓存并换用新头像")
+    parser.add_argument("--background", default="Basemap.png", help="assets 中的背景图文件名")
+    parser.add_argument("--font", default="LXGWWenKai-Medium.ttf", help="assets 中的字体文件名，缺失时用默认字体")
+    parser.add_argument("-o", "--output", help="结果 JSON 路径（默认 bench/results/render-<版本>-<时间>.json）")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+    parser.add_argument("--threshold", type=float, default=1.2, help="对比时判定变慢的 p50 倍数（默认1.2）")
+    args = parser.parse_args()
+
+    scenarios = [s for s in default_scenarios() if args.filter in s.name]
+    if not scenarios:
+        print(f"没有名称包含 {args.filter!r} 的场景")
+        return 2
+    encoding = EncodeOptions.from_config(args.format, args.quality, args.scale)
+    iterations = max(2, args.iterations)
+
+    results = []
+    # 每个场景一个全新的子进程，峰值 RSS 才不会被前面的场景抬高
+    ctx = get_context("spawn")
+    for scenario in scenarios:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+            result = executor.submit(
+                run_scenario, scenario, iterations, max(0, args.warmup), encoding, args.cold,
+                args.background, args.font
+            ).result()
+        results.append(result)
+        lat = result["latency_ms"]
+        print(f"{scenario.name}: p50 {lat['p50']:.1f}ms  p95 {lat['p95']:.1f}ms", file=sys.stderr)
+
+    revision = git_revision()
+    report = {
+        "version": RESULT_VERSION,
+        "meta": {
+            "git": revision,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "iterations": iterations,
+            "warmup": max(0, args.warmup),
+            "encoding": asdict(encoding),
+            "cold": args.cold,
+            "background": args.background,
+            "font": args.font,
+            # 字体文件不存在时用的是 Pillow 默认字体，耗时不可与真实字体的结果直接比较
+            "font_available": os.path.exists(os.path.join(PLUGIN_DIR, "assets", args.font)),
+        },
+        "results": results,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"render-{revision}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print_table(results)
+    print(f"\n结果已写入 {output}")
+    if args.compare and not compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,11 +2,13 @@ import time
 from collections import defaultdict, deque
 from astrbot.api import logger
 from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import AiocqhttpMessageEvent
+from .member_directory import MemberDirectory
 
 class AntiSpam:
-    def __init__(self, db, config):
+    def __init__(self, db, config, members: MemberDirectory):
         self.db = db
         self.config = config
+        self.members = members
         self.msg_timestamps = defaultdict(lambda: defaultdict(lambda: deque(maxlen=config.spam_count)))
         self.last_banned = defaultdict(lambda: defaultdict(float))
 
@@ -36,13 +38,9 @@ class AntiSpam:
             await event.bot.set_group_ban(group_id=int(group_id), user_id=int(user_id), duration=duration)
             start = int(time.time())
             end = start + duration
-            self.db.add_mute_record(user_id, group_id, operator, reason, duration, start, end)
+            await self.db.add_mute_record(user_id, group_id, operator, reason, duration, start, end)
             self.last_banned[group_id][user_id] = time.time()
-            nickname = await self.get_nickname(event, user_id)
+            nickname = await self.members.nickname(event, user_id)
             await event.send(event.plain_result(f"{nickname} 因{reason}被禁言{duration}秒"))
         except Exception as e:
             logger.error(f"禁言失败: {e}")
-
-    async def get_nickname(self, event: AiocqhttpMessageEvent, user_id: str) -> str:
-        from .utils import get_nickname
-        return await get_nickname(event, user_id)
\ No newline at end of file
@@ -0,0 +1,191 @@
+# coer/avatar_cache.py
+"""
+QQ 头像两级缓存。
+- 内存：最近使用的头像按条数做 LRU，命中时不读磁盘。
+- 磁盘：avatar_cache/<QQ号>.jpg，旁边的 <QQ号>.json 记录 ETag / Last-Modified 和上次校验时间；
+  目录总大小超过配额时按最近使用时间（文件 mtime）淘汰。
+超过刷新间隔后带条件请求重新校验，头像没变时服务器只回 304，不再重新下载整张图；
+同一用户的并发请求共用一次下载，所有请求共用一个 HTTP 会话。
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import aiohttp
+from astrbot.api import logger
+
+AVATAR_URL = "https://q1.qlogo.cn/g?b=qq&nk={user_id}&s=640"
+AVATAR_TIMEOUT = 10
+
+
+class AvatarCache:
+    def __init__(self, cache_dir, memory_items: int = 128, disk_quota_bytes: int = 64 * 1024 * 1024,
+                 refresh_interval: int = 24 * 3600):
+        """
+        :param cache_dir: 磁盘缓存目录
+        :param memory_items: 内存中保留的头像数
+        :param disk_quota_bytes: 磁盘缓存总字节数上限
+        :param refresh_interval: 距上次校验超过该秒数后向服务器重新校验
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.memory_items = memory_items
+        self.disk_quota_bytes = disk_quota_bytes
+        self.refresh_interval = refresh_interval
+        # QQ号 -> (头像数据, 上次校验时间)
+        self._memory: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._disk_usage: Optional[int] = None
+        self._disk_lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "not_modified": 0, "downloads": 0, "failures": 0}
+
+    def _paths(self, user_id: str) -> Tuple[Path, Path]:
+        return self.cache_dir / f"{user_id}.jpg", self.cache_dir / f"{user_id}.json"
+
+    def _session_get(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=AVATAR_TIMEOUT))
+        return self._session
+
+    async def get(self, user_id: str) -> Optional[bytes]:
+        user_id = str(user_id)
+        cached = self._memory.get(user_id)
+        if cached is not None and time.time() - cached[1] < self.refresh_interval:
+            self._memory.move_to_end(user_id)
+            self._counters["memory_hits"] += 1
+            return cached[0]
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._load(user_id))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(user_id, None))
+        return await asyncio.shield(task)
+
+    def _remember(self, user_id: str, data: bytes, checked_at: float):
+        self._memory[user_id] = (data, checked_at)
+        self._memory.move_to_end(user_id)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    async def _load(self, user_id: str) -> Optional[bytes]:
+        data, meta = await asyncio.to_thread(self._read_disk, user_id)
+        checked_at = meta.get("checked_at", 0)
+        if data is not None and time.time() - checked_at < self.refresh_interval:
+            self._counters["disk_hits"] += 1
+            self._remember(user_id, data, checked_at)
+            return data
+
+        headers = {}
+        if data is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            async with self._session_get().get(AVATAR_URL.format(user_id=user_id), headers=headers) as resp:
+                if resp.status == 304 and data is not None:
+                    self._counters["not_modified"] += 1
+                    meta["checked_at"] = time.time()
+                    await asyncio.to_thread(self._write_meta, user_id, meta)
+                    self._remember(user_id, data, meta["checked_at"])
+                    return data
+                if resp.status == 200:
+                    body = await resp.read()
+                    self._counters["downloads"] += 1
+                    meta = {
+                        "etag": resp.headers.get("ETag", ""),
+                        "last_modified": resp.headers.get("Last-Modified", ""),
+                        "checked_at": time.time(),
+                    }
+                    await asyncio.to_thread(self._write_disk, user_id, body, meta)
+                    self._remember(user_id, body, meta["checked_at"])
+                    return body
+                logger.error(f"下载头像失败，HTTP {resp.status}")
+        except Exception as e:
+            logger.error(f"下载头像异常: {e}")
+
+        self._counters["failures"] += 1
+        if data is not None:
+            logger.warning(f"头像下载失败，使用过期缓存: {user_id}")
+            # 失败后短时间内继续用旧头像，避免每次渲染都卡在下载上
+            self._remember(user_id, data, time.time() - self.refresh_interval + 300)
+        return data
+
+    def _read_disk(self, user_id: str) -> Tuple[Optional[bytes], dict]:
+        image_path, meta_path = self._paths(user_id)
+        try:
+            data = image_path.read_bytes()
+        except OSError:
+            return None, {}
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            # 旧版本只有图片文件，以修改时间作为上次校验时间并补写记录
+            meta = {"checked_at": image_path.stat().st_mtime}
+            self._write_meta(user_id, meta)
+        # 更新访问时间，供磁盘配额按最近使用淘汰
+        os.utime(image_path)
+        return data, meta
+
+    def _write_meta(self, user_id: str, meta: dict):
+        _, meta_path = self._paths(user_id)
+        try:
+            meta_path.write_text(json.dumps(meta), encoding="utf-8")
+        except OSError as e:
+            logger.warning(f"写入头像缓存信息失败: {e}")
+
+    def _write_disk(self, user_id: str, data: bytes, meta: dict):
+        image_path, _ = self._paths(user_id)
+        try:
+            old_size = image_path.stat().st_size if image_path.exists() else 0
+            tmp = image_path.with_suffix(".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, image_path)
+        except OSError as e:
+            logger.warning(f"写入头像缓存失败: {e}")
+            return
+        self._write_meta(user_id, meta)
+        with self._disk_lock:
+            if self._disk_usage is None:
+                self._disk_usage = self._scan_usage()
+            else:
+                self._disk_usage += len(data) - old_size
+            if self._disk_usage > self.disk_quota_bytes:
+                self._trim_disk()
+
+    def _scan_usage(self) -> int:
+        return sum(e.stat().st_size for e in os.scandir(self.cache_dir) if e.is_file() and e.name.endswith(".jpg"))
+
+    def _trim_disk(self):
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".jpg"):
+                st = entry.stat()
+                files.append((st.st_mtime, st.st_size, Path(entry.path)))
+        total = sum(size for _, size, _ in files)
+        # 淘汰到配额的 90%，避免每写一个头像都要扫描一次目录
+        target = self.disk_quota_bytes * 0.9
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                path.with_suffix(".json").unlink(missing_ok=True)
+                total -= size
+            except OSError:
+                pass
+        self._disk_usage = total
+
+    def stats(self) -> dict:
+        return dict(self._counters, memory_entries=len(self._memory))
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
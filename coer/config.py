@@ -44,6 +44,14 @@ class PluginConfig:
     font_file: str = "LXGWWenKai-Medium.ttf"
     menu_title: str = "感情不是感"
     menu_extra_center: str = ""
+    render_workers: int = 2
+    render_queue_size: int = 16
+    render_cache_mb: int = 32
+    render_cache_spill: bool = False
+    image_delivery: str = "内存"
+    image_format: str = "PNG"
+    image_quality: int = 85
+    image_scale: float = 1.0
 
     # 签到
     enable_sign: bool = True
@@ -73,10 +81,28 @@ class PluginConfig:
     fixed_quote: str = "今天也是元气满满的一天！"
     api_url: str = "https://v1.hitokoto.cn/"
     api_json_path: str = "hitokoto"
+    quote_mode: str = "每群每天"
+    quote_pool_size: int = 8
+    quote_timeout: float = 3.0
 
     # 命令前缀
     command_prefix: str = ""
 
+    # 数据存储
+    write_behind: bool = False
+    write_behind_interval: float = 1.0
+    write_behind_batch: int = 200
+    user_cache_size: int = 2048
+    mute_retention_days: int = 0
+    mute_archive: bool = False
+    mute_prune_batch: int = 500
+    temp_quota_mb: int = 1024
+    temp_ttl_minutes: int = 60
+    member_cache_ttl: int = 600
+    avatar_memory_items: int = 128
+    avatar_disk_mb: int = 64
+    avatar_refresh_hours: int = 24
+
     # 自定义语录
     ban_me_quotes: List[str] = field(default_factory=lambda: [
         "你已经被禁言了，好好反省一下吧~",
@@ -144,6 +170,14 @@ class PluginConfig:
             inst.font_file = disp.get("font_file", "LXGWWenKai-Medium.ttf")
             inst.menu_title = disp.get("menu_title", "感情不是感")
             inst.menu_extra_center = disp.get("menu_extra_center", "")
+            inst.render_workers = disp.get("render_workers", 2)
+            inst.render_queue_size = disp.get("render_queue_size", 16)
+            inst.render_cache_mb = disp.get("render_cache_mb", 32)
+            inst.render_cache_spill = disp.get("render_cache_spill", False)
+            inst.image_delivery = disp.get("image_delivery", "内存")
+            inst.image_format = disp.get("image_format", "PNG")
+            inst.image_quality = disp.get("image_quality", 85)
+            inst.image_scale = disp.get("image_scale", 1.0)
 
         if "sign" in config:
             s = config["sign"]
@@ -177,10 +211,29 @@ class PluginConfig:
             inst.fixed_quote = dq.get("fixed_quote", "今天也是元气满满的一天！")
             inst.api_url = dq.get("api_url", "https://v1.hitokoto.cn/")
             inst.api_json_path = dq.get("api_json_path", "hitokoto")
+            inst.quote_mode = dq.get("quote_mode", "每群每天")
+            inst.quote_pool_size = dq.get("quote_pool_size", 8)
+            inst.quote_timeout = dq.get("quote_timeout", 3.0)
 
         if "command" in config:
             inst.command_prefix = config["command"].get("command_prefix", "")
 
+        if "storage" in config:
+            st = config["storage"]
+            inst.write_behind = st.get("write_behind", False)
+            inst.write_behind_interval = st.get("write_behind_interval", 1.0)
+            inst.write_behind_batch = st.get("write_behind_batch", 200)
+            inst.user_cache_size = st.get("user_cache_size", 2048)
+            inst.mute_retention_days = st.get("mute_retention_days", 0)
+            inst.mute_archive = st.get("mute_archive", False)
+            inst.mute_prune_batch = st.get("mute_prune_batch", 500)
+            inst.temp_quota_mb = st.get("temp_quota_mb", 1024)
+            inst.temp_ttl_minutes = st.get("temp_ttl_minutes", 60)
+            inst.member_cache_ttl = st.get("member_cache_ttl", 600)
+            inst.avatar_memory_items = st.get("avatar_memory_items", 128)
+            inst.avatar_disk_mb = st.get("avatar_disk_mb", 64)
+            inst.avatar_refresh_hours = st.get("avatar_refresh_hours", 24)
+
         if "messages" in config and "ban_me_quotes" in config["messages"]:
             quotes = config["messages"]["ban_me_quotes"]
             if isinstance(quotes, str):
@@ -1,205 +1,571 @@
 import sqlite3
 import json
+import asyncio
+import functools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Iterator
 from datetime import datetime
 from astrbot.api import logger
 
+# 连接参数：WAL 日志 + NORMAL 同步，页缓存约 8MB，锁等待最多 5 秒
+CACHE_SIZE_KB = 8192
+BUSY_TIMEOUT_MS = 5000
+
+# 未写入过数据的用户的默认值
+DEFAULT_USER = {"points": 0, "sign_count": 0, "last_sign_time": 0, "continuous_days": 0, "immunity_cards": 0}
+
+# 可用于个人排名查询的指标（均有 (group_id, 指标 DESC, user_id) 索引）
+RANK_METRICS = ("points", "sign_count")
+
+# 群数据导入时 users 表冲突的处理方式
+IMPORT_POLICIES = ("overwrite", "add", "skip")
+EXPORT_FORMAT = "yoto-group-export"
+
+# 每个导出/导入表的列（不含自增 id，导入时重新分配）
+TRANSFER_COLUMNS = {
+    "users": ("user_id", "points", "sign_count", "last_sign_time", "continuous_days", "immunity_cards"),
+    "mutes": ("user_id", "operator", "reason", "duration", "start_time", "end_time"),
+    "purchases": ("user_id", "item_id", "quantity", "purchase_time", "used", "used_time"),
+}
+
+USERS_DDL = """
+    CREATE TABLE IF NOT EXISTS users (
+        group_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        points INTEGER DEFAULT 0,
+        sign_count INTEGER DEFAULT 0,
+        last_sign_time INTEGER DEFAULT 0,
+        continuous_days INTEGER DEFAULT 0,
+        immunity_cards INTEGER DEFAULT 0,
+        PRIMARY KEY (group_id, user_id)
+    )
+"""
+
+# 导出时每页读取的行数、导入时每个事务写入的行数
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 5000
+
+# 各表的分页查询：(SQL, 游标列, 初始游标)
+_EXPORT_QUERIES = {
+    table: (sql.format(cols=", ".join(TRANSFER_COLUMNS[table])), cursor_col, first)
+    for table, (sql, cursor_col, first) in {
+        "users": ("SELECT {cols} FROM users WHERE user_id > ? AND group_id=? "
+                  "ORDER BY user_id LIMIT ?", "user_id", ""),
+        "mutes": ("SELECT id, {cols} FROM mutes WHERE id > ? AND group_id=? "
+                  "ORDER BY id LIMIT ?", "id", 0),
+        "purchases": ("SELECT id, {cols} FROM purchases p WHERE id > ? AND EXISTS "
+                      "(SELECT 1 FROM users u WHERE u.group_id=? AND u.user_id=p.user_id) "
+                      "ORDER BY id LIMIT ?", "id", 0),
+    }.items()
+}
+
+# users 已存在时各导入策略的冲突处理
+_USER_CONFLICT = {
+    "overwrite": "DO UPDATE SET " + ", ".join(f"{c}=excluded.{c}" for c in TRANSFER_COLUMNS["users"][1:]),
+    "add": """DO UPDATE SET
+        points = users.points + excluded.points,
+        sign_count = users.sign_count + excluded.sign_count,
+        immunity_cards = users.immunity_cards + excluded.immunity_cards,
+        continuous_days = CASE WHEN excluded.last_sign_time > users.last_sign_time
+                               THEN excluded.continuous_days ELSE users.continuous_days END,
+        last_sign_time = MAX(users.last_sign_time, excluded.last_sign_time)""",
+    "skip": "DO NOTHING",
+}
+
+
+def _import_statement(table: str, policy: str) -> str:
+    if table == "users":
+        cols = TRANSFER_COLUMNS["users"]
+        return f"""
+            INSERT INTO users (group_id, {", ".join(cols)}) VALUES (?, {", ".join("?" for _ in cols)})
+            ON CONFLICT(group_id, user_id) {_USER_CONFLICT[policy]}
+        """
+    if table == "mutes":
+        return """
+            INSERT INTO mutes (group_id, user_id, operator, reason, duration, start_time, end_time)
+            SELECT ?1, ?2, ?3, ?4, ?5, ?6, ?7
+            WHERE NOT EXISTS (SELECT 1 FROM mutes WHERE user_id=?2 AND group_id=?1 AND start_time=?6
+                              AND reason IS ?4 AND duration IS ?5)
+        """
+    return """
+        INSERT INTO purchases (user_id, item_id, quantity, purchase_time, used, used_time)
+        SELECT ?1, ?2, ?3, ?4, ?5, ?6
+        WHERE NOT EXISTS (SELECT 1 FROM purchases WHERE user_id=?1 AND item_id=?2 AND purchase_time=?4)
+    """
+
+
+def _export_header(group_id: str) -> str:
+    meta = {"format": EXPORT_FORMAT, "version": 1, "group_id": group_id,
+            "exported_at": int(datetime.now().timestamp())}
+    return json.dumps(meta, ensure_ascii=False) + "\n"
+
+
+def _write_export_rows(f, table: str, rows: List[Dict[str, Any]]):
+    f.writelines(json.dumps({"table": table, "row": row}, ensure_ascii=False) + "\n" for row in rows)
+
+
+def _iter_import_batches(path: Path, group_id: str, batch_size: int) -> Iterator[Tuple[str, List[tuple]]]:
+    """逐行读取导出文件，按表攒成最多 batch_size 行的参数元组批次 (表名, 行列表)；只做文件读取和解析"""
+    batches: Dict[str, List[tuple]] = {table: [] for table in TRANSFER_COLUMNS}
+    with open(path, "r", encoding="utf-8") as f:
+        meta = json.loads(f.readline() or "{}")
+        if meta.get("format") != EXPORT_FORMAT:
+            raise ValueError("不是有效的群数据导出文件")
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            table, row = record.get("table"), record.get("row") or {}
+            if table not in TRANSFER_COLUMNS:
+                continue
+            values = tuple(row.get(c) for c in TRANSFER_COLUMNS[table])
+            batches[table].append((group_id, *values) if table != "purchases" else values)
+            if len(batches[table]) >= batch_size:
+                yield table, batches[table]
+                batches[table] = []
+    for table, rows in batches.items():
+        if rows:
+            yield table, rows
+
+
+# 大表迁移时每个事务复制的行数，避免长时间持有写锁
+MIGRATION_BATCH_SIZE = 5000
+
+# 过期禁言记录清理任务的运行间隔（秒）
+MUTE_RETENTION_INTERVAL = 3600
+
+# 关闭连接时等待数据库解锁、提交剩余缓冲的最长时间（秒）及两次重试的间隔
+CLOSE_FLUSH_TIMEOUT = 15.0
+CLOSE_FLUSH_RETRY_INTERVAL = 0.2
+
+
+def _is_busy(error: sqlite3.Error) -> bool:
+    """数据库被其他连接锁住（SQLITE_BUSY / SQLITE_LOCKED），属于可重试的错误"""
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    cur = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,))
+    return cur.fetchone() is not None
+
+
+def _migrate_v1(conn: sqlite3.Connection):
+    """基础表结构，并把无 group_id 的旧 users 表迁移到群隔离结构"""
+    columns = [col[1] for col in conn.execute("PRAGMA table_info(users)").fetchall()]
+    if columns and "group_id" not in columns:
+        logger.warning("检测到数据库需要迁移以支持群隔离，正在进行自动迁移...")
+        with conn:
+            conn.execute("ALTER TABLE users RENAME TO users_old")
+    with conn:
+        conn.execute(USERS_DDL)
+
+    # 分批复制旧数据：每批复制后即从 users_old 删除并提交，中断后重启可从断点继续
+    if _table_exists(conn, "users_old"):
+        copied = 0
+        while True:
+            with conn:
+                row = conn.execute(
+                    "SELECT MAX(rowid) FROM (SELECT rowid FROM users_old ORDER BY rowid LIMIT ?)",
+                    (MIGRATION_BATCH_SIZE,)
+                ).fetchone()
+                last_rowid = row[0]
+                if last_rowid is None:
+                    break
+                cur = conn.execute("""
+                    INSERT OR IGNORE INTO users (group_id, user_id, points, sign_count, last_sign_time, continuous_days, immunity_cards)
+                    SELECT '0', user_id, points, sign_count, last_sign_time, continuous_days, immunity_cards
+                    FROM users_old WHERE rowid <= ?
+                """, (last_rowid,))
+                copied += cur.rowcount
+                conn.execute("DELETE FROM users_old WHERE rowid <= ?", (last_rowid,))
+        with conn:
+            conn.execute("DROP TABLE users_old")
+        logger.info(f"数据库迁移完成，{copied} 条旧数据已放入群ID '0'，请根据需要调整。")
+
+    with conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS shop_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                description TEXT,
+                price INTEGER NOT NULL,
+                daily_limit INTEGER DEFAULT 0,
+                total_limit INTEGER DEFAULT 0,
+                sold_today INTEGER DEFAULT 0,
+                sold_total INTEGER DEFAULT 0,
+                last_reset_day TEXT,
+                data TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS purchases (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                quantity INTEGER DEFAULT 1,
+                purchase_time INTEGER NOT NULL,
+                used BOOLEAN DEFAULT 0,
+                used_time INTEGER
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS mutes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                group_id TEXT NOT NULL,
+                operator TEXT,
+                reason TEXT,
+                duration INTEGER,
+                start_time INTEGER,
+                end_time INTEGER
+            )
+        """)
+
+
+def _migrate_v2(conn: sqlite3.Connection):
+    """排行榜与历史查询使用的覆盖索引"""
+    with conn:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_users_points ON users (group_id, points DESC, user_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_users_sign ON users (group_id, sign_count DESC, user_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_mutes_user ON mutes (user_id, group_id, start_time)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_purchases_user ON purchases (user_id, item_id, purchase_time)")
+
+
+def _migrate_v3(conn: sqlite3.Connection):
+    """禁言记录按用户/群/日汇总表，供过期记录清理后保留统计"""
+    with conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS mute_daily_stats (
+                group_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                mute_count INTEGER DEFAULT 0,
+                total_duration INTEGER DEFAULT 0,
+                PRIMARY KEY (group_id, user_id, day)
+            )
+        """)
+
+
+# 按顺序排列的迁移步骤，第 N 个步骤把库从 user_version N-1 升级到 N；只能追加，不能修改已发布的步骤
+MIGRATIONS = [_migrate_v1, _migrate_v2, _migrate_v3]
+
+
 class Database:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, write_behind: bool = False, batch_size: int = 200,
+                 user_cache_size: int = 2048):
         self.db_path = db_path
+        # 整个插件共用一个长连接，所有访问通过 _lock 串行化
+        self._lock = threading.RLock()
+        self._conn = self._connect()
+
+        # 延迟写入：积分/用户/禁言记录的变更先进入缓冲区，批量在一个事务中提交
+        self.write_behind = write_behind
+        self.batch_size = max(1, batch_size)
+        self._pending: List[Tuple[Tuple[str, str], str, tuple]] = []
+        self._pending_keys = set()  # 缓冲区中涉及的 (group_id, user_id)
+
+        # 用户行 LRU 缓存（写穿透），键为 (group_id, user_id)；容量为 0 时关闭
+        self.user_cache_size = max(0, user_cache_size)
+        self._user_cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+        self._archive_path: Optional[Path] = None  # 已 ATTACH 的禁言归档库
+
         self._init_db()
 
-    def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
-            # 1. 检查 users 表是否存在
-            cursor = conn.execute(
-                "SELECT name FROM sqlite_master WHERE type='table' AND name='users'"
-            )
-            table_exists = cursor.fetchone() is not None
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
 
-            if not table_exists:
-                # 直接创建新表
-                conn.execute("""
-                    CREATE TABLE users (
-                        group_id TEXT NOT NULL,
-                        user_id TEXT NOT NULL,
-                        points INTEGER DEFAULT 0,
-                        sign_count INTEGER DEFAULT 0,
-                        last_sign_time INTEGER DEFAULT 0,
-                        continuous_days INTEGER DEFAULT 0,
-                        immunity_cards INTEGER DEFAULT 0,
-                        PRIMARY KEY (group_id, user_id)
-                    )
-                """)
-                logger.info("users 表创建成功")
-            else:
-                # 表已存在，检查是否需要添加 group_id 列
-                cursor = conn.execute("PRAGMA table_info(users)")
-                columns = [col[1] for col in cursor.fetchall()]
-                if "group_id" not in columns:
-                    logger.warning("检测到数据库需要迁移以支持群隔离，正在进行自动迁移...")
-                    # 再次确认表仍然存在（防止并发问题）
-                    cursor_check = conn.execute(
-                        "SELECT name FROM sqlite_master WHERE type='table' AND name='users'"
-                    )
-                    if cursor_check.fetchone() is None:
-                        # 表已被删除，重新创建
-                        conn.execute("""
-                            CREATE TABLE users (
-                                group_id TEXT NOT NULL,
-                                user_id TEXT NOT NULL,
-                                points INTEGER DEFAULT 0,
-                                sign_count INTEGER DEFAULT 0,
-                                last_sign_time INTEGER DEFAULT 0,
-                                continuous_days INTEGER DEFAULT 0,
-                                immunity_cards INTEGER DEFAULT 0,
-                                PRIMARY KEY (group_id, user_id)
-                            )
-                        """)
-                        logger.info("users 表已重新创建")
-                    else:
-                        # 执行迁移
-                        conn.execute("ALTER TABLE users RENAME TO users_old")
-                        conn.execute("""
-                            CREATE TABLE users (
-                                group_id TEXT NOT NULL,
-                                user_id TEXT NOT NULL,
-                                points INTEGER DEFAULT 0,
-                                sign_count INTEGER DEFAULT 0,
-                                last_sign_time INTEGER DEFAULT 0,
-                                continuous_days INTEGER DEFAULT 0,
-                                immunity_cards INTEGER DEFAULT 0,
-                                PRIMARY KEY (group_id, user_id)
-                            )
-                        """)
-                        conn.execute("""
-                            INSERT INTO users (group_id, user_id, points, sign_count, last_sign_time, continuous_days, immunity_cards)
-                            SELECT '0', user_id, points, sign_count, last_sign_time, continuous_days, immunity_cards FROM users_old
-                        """)
-                        conn.execute("DROP TABLE users_old")
-                        logger.info("数据库迁移完成，旧数据已放入群ID '0'，请根据需要调整。")
-
-            # 2. 创建其他表（保持不变）
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS shop_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    description TEXT,
-                    price INTEGER NOT NULL,
-                    daily_limit INTEGER DEFAULT 0,
-                    total_limit INTEGER DEFAULT 0,
-                    sold_today INTEGER DEFAULT 0,
-                    sold_total INTEGER DEFAULT 0,
-                    last_reset_day TEXT,
-                    data TEXT
-                )
-            """)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS purchases (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    item_id INTEGER NOT NULL,
-                    quantity INTEGER DEFAULT 1,
-                    purchase_time INTEGER NOT NULL,
-                    used BOOLEAN DEFAULT 0,
-                    used_time INTEGER
-                )
-            """)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS mutes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    group_id TEXT NOT NULL,
-                    operator TEXT,
-                    reason TEXT,
-                    duration INTEGER,
-                    start_time INTEGER,
-                    end_time INTEGER
-                )
-            """)
-            conn.commit()
+    def close(self, timeout: float = CLOSE_FLUSH_TIMEOUT):
+        """
+        关闭长连接（插件终止时调用，可重复调用）。
+        先提交缓冲区中剩余的写入；数据库被占用时在 timeout 秒内反复重试，仍未提交的写入记录错误后丢弃。
+        """
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush_before_close(timeout)
+            try:
+                self._conn.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                logger.warning(f"数据库优化失败: {e}")
+            self._conn.close()
+            self._conn = None
+            self._archive_path = None
+            logger.info("数据库连接已关闭")
+
+    def _flush_before_close(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while True:
+            self.flush(quiet=True)
+            if not self._pending or time.monotonic() >= deadline:
+                break
+            time.sleep(CLOSE_FLUSH_RETRY_INTERVAL)
+        if self._pending:
+            logger.error(f"数据库持续被占用，关闭时丢弃 {len(self._pending)} 条未提交的延迟写入")
+            self._pending = []
+            self._pending_keys = set()
+
+    # ---------- 延迟写入 ----------
+    def _write(self, key: Tuple[str, str], sql: str, params: tuple):
+        """
+        执行一条写操作；开启延迟写入时只放入缓冲区，缓冲区满时立即提交。
+        延迟写入模式下调用方的变更已经进入缓冲区，提交失败不会抛给调用方，由 flush 记录并在之后重试。
+        """
+        with self._lock:
+            if not self.write_behind:
+                with self._conn as conn:
+                    conn.execute(sql, params)
+                return
+            self._pending.append((key, sql, params))
+            self._pending_keys.add(key)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def _requeue(self, pending: List[Tuple[Tuple[str, str], str, tuple]]):
+        self._pending = pending + self._pending
+        self._pending_keys.update(key for key, _, _ in pending)
+
+    def flush(self, quiet: bool = False) -> int:
+        """
+        将缓冲区中的写操作在一个事务中提交，返回提交的条数。
+        数据库被其他连接锁住时整批放回缓冲区等下次提交（quiet 为 True 时不记录警告，由调用方自行重试）；
+        其他错误说明批中有无法执行的语句，改为逐条提交并丢弃出错的语句，不会无限重试。
+        """
+        with self._lock:
+            if not self._pending:
+                return 0
+            pending = self._pending
+            self._pending = []
+            self._pending_keys = set()
+            try:
+                with self._conn as conn:
+                    for _, sql, params in pending:
+                        conn.execute(sql, params)
+                return len(pending)
+            except sqlite3.Error as e:
+                if _is_busy(e):
+                    self._requeue(pending)
+                    if not quiet:
+                        logger.warning(f"数据库被占用，{len(pending)} 条写入稍后重试: {e}")
+                    return 0
+                logger.warning(f"批量提交失败，改为逐条提交: {e}")
+            return self._flush_each(pending, quiet)
+
+    def _flush_each(self, pending: List[Tuple[Tuple[str, str], str, tuple]], quiet: bool = False) -> int:
+        """在一个事务中逐条执行，每条用 SAVEPOINT 隔离，出错的语句回滚并丢弃"""
+        written = 0
+        try:
+            with self._conn as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for key, sql, params in pending:
+                    conn.execute("SAVEPOINT write_behind")
+                    try:
+                        conn.execute(sql, params)
+                        written += 1
+                    except sqlite3.Error as e:
+                        conn.execute("ROLLBACK TO write_behind")
+                        if _is_busy(e):
+                            raise
+                        logger.error(f"丢弃无法写入的语句: {e}；SQL: {' '.join(sql.split())}；参数: {params}")
+                        # 缓存中该用户的值已按这条写入更新过，丢弃后以数据库为准
+                        self._user_cache.pop(key, None)
+                    finally:
+                        conn.execute("RELEASE write_behind")
+        except sqlite3.Error as e:
+            self._requeue(pending)
+            if not quiet:
+                logger.warning(f"逐条提交失败，{len(pending)} 条写入稍后重试: {e}")
+            return 0
+        return written
+
+    # ---------- 用户缓存 ----------
+    def _cache_put(self, key: Tuple[str, str], user: Dict[str, Any]):
+        if not self.user_cache_size:
+            return
+        self._user_cache[key] = user
+        self._user_cache.move_to_end(key)
+        while len(self._user_cache) > self.user_cache_size:
+            self._user_cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """用户缓存的命中/未命中次数和容量，以及延迟写入缓冲区中尚未提交的条数"""
+        with self._lock:
+            return {
+                "hits": self._cache_hits,
+                "misses": self._cache_misses,
+                "size": len(self._user_cache),
+                "capacity": self.user_cache_size,
+                "pending": len(self._pending),
+            }
+
+    def _ensure_visible(self, key: Optional[Tuple[str, str]] = None):
+        """读之前保证能看到自己的写：key 为空时提交全部缓冲，否则仅在该用户有未提交变更时提交"""
+        if not self._pending:
+            return
+        if key is None or key in self._pending_keys:
+            self.flush()
+
+    def _init_db(self):
+        """按 PRAGMA user_version 依次执行尚未应用的迁移步骤；已是最新版本时只读一次 pragma"""
+        with self._lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for target in range(version + 1, len(MIGRATIONS) + 1):
+                step = MIGRATIONS[target - 1]
+                logger.info(f"数据库迁移：v{target - 1} -> v{target}（{step.__doc__.strip()}）")
+                step(self._conn)
+                self._conn.execute(f"PRAGMA user_version = {target}")
 
     # ---------- 用户相关 ----------
     def get_user(self, group_id: str, user_id: str) -> Dict[str, Any]:
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.execute("SELECT * FROM users WHERE group_id = ? AND user_id = ?", (group_id, user_id))
-            row = cur.fetchone()
-            if row:
-                return dict(row)
-            else:
-                conn.execute("INSERT INTO users (group_id, user_id) VALUES (?, ?)", (group_id, user_id))
-                conn.commit()
-                return {"group_id": group_id, "user_id": user_id, "points": 0, "sign_count": 0,
-                        "last_sign_time": 0, "continuous_days": 0, "immunity_cards": 0}
+        """只读查询；用户不存在时返回默认值，不会插入新行（首次写入时才建行）"""
+        key = (group_id, user_id)
+        with self._lock:
+            cached = self._user_cache.get(key)
+            if cached is not None:
+                self._cache_hits += 1
+                self._user_cache.move_to_end(key)
+                return dict(cached)
+            self._cache_misses += 1
+            self._ensure_visible(key)
+            row = self._conn.execute(
+                "SELECT * FROM users WHERE group_id = ? AND user_id = ?", (group_id, user_id)
+            ).fetchone()
+            user = dict(row) if row else {"group_id": group_id, "user_id": user_id, **DEFAULT_USER}
+            self._cache_put(key, user)
+            return dict(user)
 
     def update_user(self, group_id: str, user_id: str, **kwargs):
-        fields = ", ".join([f"{k}=?" for k in kwargs])
-        values = list(kwargs.values()) + [group_id, user_id]
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(f"UPDATE users SET {fields} WHERE group_id=? AND user_id=?", values)
-            conn.commit()
+        columns = ", ".join(kwargs)
+        placeholders = ", ".join("?" for _ in kwargs)
+        updates = ", ".join([f"{k}=excluded.{k}" for k in kwargs])
+        with self._lock:
+            self._write(
+                (group_id, user_id),
+                f"INSERT INTO users (group_id, user_id, {columns}) VALUES (?, ?, {placeholders}) "
+                f"ON CONFLICT(group_id, user_id) DO UPDATE SET {updates}",
+                (group_id, user_id, *kwargs.values())
+            )
+            cached = self._user_cache.get((group_id, user_id))
+            if cached is not None:
+                cached.update(kwargs)
 
     def add_points(self, group_id: str, user_id: str, points: int):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("UPDATE users SET points = points + ? WHERE group_id=? AND user_id=?", (points, group_id, user_id))
-            conn.commit()
+        with self._lock:
+            self._write(
+                (group_id, user_id),
+                "INSERT INTO users (group_id, user_id, points) VALUES (?, ?, ?) "
+                "ON CONFLICT(group_id, user_id) DO UPDATE SET points = points + excluded.points",
+                (group_id, user_id, points)
+            )
+            cached = self._user_cache.get((group_id, user_id))
+            if cached is not None:
+                cached["points"] += points
+
+    def apply_sign(self, group_id: str, user_id: str, now: int, cutoff: int, streak_window: int,
+                   points_gain: int, bonus_days: List[int]) -> Optional[Dict[str, Any]]:
+        """
+        原子签到：资格检查、连续天数、积分奖励和签到次数在一条 UPSERT 中完成，
+        同一用户的并发签到只会有一次成功。
+        :param now: 本次签到时间戳
+        :param cutoff: 上次签到时间不晚于该时间戳才允许签到
+        :param streak_window: 距上次签到在该秒数内视为连续签到
+        :param points_gain: 本次基础积分
+        :param bonus_days: 连续签到天数命中其中之一时额外奖励 1 积分
+        :return: 签到后的用户行；不满足签到条件时返回 None
+        """
+        key = (group_id, user_id)
+        streak = ("CASE WHEN users.last_sign_time > 0 AND :now - users.last_sign_time < :window "
+                  "THEN users.continuous_days + 1 ELSE 1 END")
+        bonus = "(CASE WHEN ({}) IN (SELECT value FROM json_each(:bonus)) THEN 1 ELSE 0 END)"
+        params = {
+            "group_id": group_id, "user_id": user_id, "now": now, "cutoff": cutoff,
+            "window": streak_window, "gain": points_gain, "bonus": json.dumps(bonus_days),
+        }
+        with self._lock:
+            # 先提交该用户缓冲中的写入，保证签到基于最新数据
+            self._ensure_visible(key)
+            with self._conn as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(f"""
+                    INSERT INTO users (group_id, user_id, points, sign_count, last_sign_time, continuous_days)
+                    VALUES (:group_id, :user_id, :gain + {bonus.format("1")}, 1, :now, 1)
+                    ON CONFLICT(group_id, user_id) DO UPDATE SET
+                        points = users.points + :gain + {bonus.format(streak)},
+                        sign_count = users.sign_count + 1,
+                        last_sign_time = :now,
+                        continuous_days = {streak}
+                    WHERE users.last_sign_time <= :cutoff
+                    RETURNING *
+                """, params).fetchone()
+            if row is None:
+                return None
+            user = dict(row)
+            self._cache_put(key, user)
+            return dict(user)
 
     def get_shop_items(self) -> List[Dict]:
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._lock, self._conn as conn:
             cur = conn.execute("SELECT * FROM shop_items ORDER BY id")
             return [dict(row) for row in cur.fetchall()]
 
     def get_item(self, item_id: int) -> Optional[Dict]:
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._lock, self._conn as conn:
             cur = conn.execute("SELECT * FROM shop_items WHERE id=?", (item_id,))
             row = cur.fetchone()
             return dict(row) if row else None
 
     def add_item(self, name: str, price: int, description: str = "",
                  daily_limit: int = 0, total_limit: int = 0, data: str = "{}"):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock, self._conn as conn:
             conn.execute(
                 "INSERT INTO shop_items (name, description, price, daily_limit, total_limit, data) VALUES (?,?,?,?,?,?)",
                 (name, description, price, daily_limit, total_limit, data)
             )
-            conn.commit()
 
     def update_item(self, item_id: int, **kwargs):
         fields = ", ".join([f"{k}=?" for k in kwargs])
         values = list(kwargs.values()) + [item_id]
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock, self._conn as conn:
             conn.execute(f"UPDATE shop_items SET {fields} WHERE id=?", values)
-            conn.commit()
 
     def delete_item(self, item_id: int):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock, self._conn as conn:
             conn.execute("DELETE FROM shop_items WHERE id=?", (item_id,))
-            conn.commit()
 
     def reset_daily_limits(self):
         today = datetime.now().strftime("%Y-%m-%d")
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock, self._conn as conn:
             conn.execute("UPDATE shop_items SET sold_today = 0 WHERE last_reset_day != ? OR last_reset_day IS NULL", (today,))
             conn.execute("UPDATE shop_items SET last_reset_day = ?", (today,))
-            conn.commit()
 
     def add_purchase(self, user_id: str, item_id: int, quantity: int = 1) -> int:
         now = int(datetime.now().timestamp())
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock, self._conn as conn:
             cur = conn.execute(
                 "INSERT INTO purchases (user_id, item_id, quantity, purchase_time) VALUES (?,?,?,?)",
                 (user_id, item_id, quantity, now)
             )
-            conn.commit()
             return cur.lastrowid
 
     def get_user_purchases(self, user_id: str, item_id: Optional[int] = None) -> List[Dict]:
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._lock, self._conn as conn:
             if item_id:
                 cur = conn.execute(
                     "SELECT * FROM purchases WHERE user_id=? AND item_id=? ORDER BY purchase_time DESC",
@@ -213,25 +579,23 @@ class Database:
             return [dict(row) for row in cur.fetchall()]
 
     def mark_card_used(self, purchase_id: int):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock, self._conn as conn:
             conn.execute(
                 "UPDATE purchases SET used=1, used_time=? WHERE id=?",
                 (int(datetime.now().timestamp()), purchase_id)
             )
-            conn.commit()
 
     def add_mute_record(self, user_id: str, group_id: str, operator: str, reason: str,
                         duration: int, start_time: int, end_time: int):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                "INSERT INTO mutes (user_id, group_id, operator, reason, duration, start_time, end_time) VALUES (?,?,?,?,?,?,?)",
-                (user_id, group_id, operator, reason, duration, start_time, end_time)
-            )
-            conn.commit()
+        self._write(
+            (group_id, user_id),
+            "INSERT INTO mutes (user_id, group_id, operator, reason, duration, start_time, end_time) VALUES (?,?,?,?,?,?,?)",
+            (user_id, group_id, operator, reason, duration, start_time, end_time)
+        )
 
     def get_latest_mute(self, user_id: str, group_id: Optional[str] = None) -> Optional[Dict]:
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._lock, self._conn as conn:
+            self._ensure_visible((group_id, user_id) if group_id else None)
             if group_id:
                 cur = conn.execute(
                     "SELECT * FROM mutes WHERE user_id=? AND group_id=? ORDER BY start_time DESC LIMIT 1",
@@ -245,21 +609,355 @@ class Database:
             row = cur.fetchone()
             return dict(row) if row else None
 
+    def get_mute_summary(self, group_id: str, user_id: str) -> Dict[str, int]:
+        """用户在群内的累计禁言次数与时长（已归档汇总 + 尚未清理的明细）"""
+        with self._lock:
+            self._ensure_visible((group_id, user_id))
+            row = self._conn.execute("""
+                SELECT
+                    (SELECT COALESCE(SUM(mute_count), 0) FROM mute_daily_stats WHERE group_id=?1 AND user_id=?2)
+                    + (SELECT COUNT(*) FROM mutes WHERE user_id=?2 AND group_id=?1),
+                    (SELECT COALESCE(SUM(total_duration), 0) FROM mute_daily_stats WHERE group_id=?1 AND user_id=?2)
+                    + (SELECT COALESCE(SUM(duration), 0) FROM mutes WHERE user_id=?2 AND group_id=?1)
+            """, (group_id, user_id)).fetchone()
+            return {"count": row[0], "total_duration": row[1]}
+
+    def _attach_archive(self, archive_path: Path):
+        if self._archive_path == archive_path:
+            return
+        if self._archive_path is not None:
+            self._conn.execute("DETACH DATABASE archive")
+        self._conn.execute("ATTACH DATABASE ? AS archive", (str(archive_path),))
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS archive.mutes (
+                id INTEGER PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                group_id TEXT NOT NULL,
+                operator TEXT,
+                reason TEXT,
+                duration INTEGER,
+                start_time INTEGER,
+                end_time INTEGER
+            )
+        """)
+        self._archive_path = archive_path
+
+    def prune_mutes(self, cutoff: int, batch_size: int = 500, archive_path: Optional[Path] = None) -> int:
+        """
+        清理一批开始时间早于 cutoff 的禁言记录：先按 (群, 用户, 日) 累加到 mute_daily_stats，
+        再删除（指定 archive_path 时先移入归档库）。每次只处理一批，返回处理的条数。
+        """
+        with self._lock:
+            self._ensure_visible()
+            if archive_path is not None:
+                self._attach_archive(archive_path)
+            with self._conn as conn:
+                last_id = conn.execute(
+                    "SELECT MAX(id) FROM (SELECT id FROM mutes WHERE start_time < ? ORDER BY id LIMIT ?)",
+                    (cutoff, batch_size)
+                ).fetchone()[0]
+                if last_id is None:
+                    return 0
+                conn.execute("""
+                    INSERT INTO mute_daily_stats (group_id, user_id, day, mute_count, total_duration)
+                    SELECT group_id, user_id, date(start_time, 'unixepoch', 'localtime'), COUNT(*), COALESCE(SUM(duration), 0)
+                    FROM mutes WHERE id <= ? AND start_time < ?
+                    GROUP BY group_id, user_id, date(start_time, 'unixepoch', 'localtime')
+                    ON CONFLICT(group_id, user_id, day) DO UPDATE SET
+                        mute_count = mute_count + excluded.mute_count,
+                        total_duration = total_duration + excluded.total_duration
+                """, (last_id, cutoff))
+                if archive_path is not None:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO archive.mutes SELECT * FROM main.mutes WHERE id <= ? AND start_time < ?",
+                        (last_id, cutoff)
+                    )
+                cur = conn.execute("DELETE FROM mutes WHERE id <= ? AND start_time < ?", (last_id, cutoff))
+                return cur.rowcount
+
     def get_points_rank(self, group_id: str, limit: int = 20) -> List[Tuple[str, int]]:
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock, self._conn as conn:
+            self._ensure_visible()
             cur = conn.execute(
                 "SELECT user_id, points FROM users WHERE group_id=? ORDER BY points DESC LIMIT ?",
                 (group_id, limit)
             )
-            return cur.fetchall()
+            return [tuple(row) for row in cur.fetchall()]
 
     def get_sign_rank(self, group_id: str, limit: int = 20) -> List[Tuple[str, int]]:
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock, self._conn as conn:
+            self._ensure_visible()
             cur = conn.execute(
                 "SELECT user_id, sign_count FROM users WHERE group_id=? ORDER BY sign_count DESC LIMIT ?",
                 (group_id, limit)
             )
-            return cur.fetchall()
+            return [tuple(row) for row in cur.fetchall()]
 
     def get_card_usage_rank(self, group_id: str, limit: int = 20) -> List[Tuple[str, int]]:
         return []
+
+    def get_user_rank(self, group_id: str, user_id: str, metric: str = "points",
+                      neighbours: bool = False) -> Dict[str, Any]:
+        """
+        查询用户在群内某项指标上的精确名次（从 1 开始，同分同名次）。
+        通过索引计数比该用户高的人数，不需要取出整个排行榜。
+        :return: {"rank", "total", "value"}，neighbours 为 True 时额外包含
+                 "above"/"below"：紧邻的上一名和下一名 (user_id, value)，不存在时为 None；
+                 用户在该群没有数据时 rank 为 None（未上榜）
+        """
+        if metric not in RANK_METRICS:
+            raise ValueError(f"不支持的排名指标: {metric}")
+        with self._lock, self._conn as conn:
+            self._ensure_visible()
+            row = conn.execute(
+                f"SELECT {metric} FROM users WHERE group_id=? AND user_id=?", (group_id, user_id)
+            ).fetchone()
+            if row is None:
+                total = conn.execute("SELECT COUNT(*) FROM users WHERE group_id=?", (group_id,)).fetchone()[0]
+                result = {"rank": None, "total": total, "value": 0}
+                if neighbours:
+                    result["above"] = result["below"] = None
+                return result
+            value = row[0]
+            higher = conn.execute(
+                f"SELECT COUNT(*) FROM users WHERE group_id=? AND {metric} > ?", (group_id, value)
+            ).fetchone()[0]
+            # 两段计数正好覆盖整个群，比再单独 COUNT 全群少扫一遍索引
+            not_higher = conn.execute(
+                f"SELECT COUNT(*) FROM users WHERE group_id=? AND {metric} <= ?", (group_id, value)
+            ).fetchone()[0]
+            result = {"rank": higher + 1, "total": higher + not_higher, "value": value}
+            if neighbours:
+                above = conn.execute(
+                    f"SELECT user_id, {metric} FROM users WHERE group_id=? AND {metric} > ? "
+                    f"ORDER BY {metric} ASC LIMIT 1",
+                    (group_id, value)
+                ).fetchone()
+                below = conn.execute(
+                    f"SELECT user_id, {metric} FROM users WHERE group_id=? AND {metric} < ? "
+                    f"ORDER BY {metric} DESC LIMIT 1",
+                    (group_id, value)
+                ).fetchone()
+                result["above"] = tuple(above) if above else None
+                result["below"] = tuple(below) if below else None
+            return result
+
+
+    # ---------- 群数据导入导出 ----------
+    def read_group_page(self, group_id: str, table: str, last: Any = None,
+                        batch_size: int = EXPORT_BATCH_SIZE) -> Tuple[List[Dict[str, Any]], Any]:
+        """
+        读取一个群某张表的一页数据，返回 (行列表, 下一页游标)；行列表为空表示已读完。
+        沿索引做游标分页（users 按主键，其余按自增 id），每页是一次独立的短查询。
+        purchases 表没有群号，按该群 users 中的用户导出。
+        """
+        sql, cursor_col, first = _EXPORT_QUERIES[table]
+        with self._lock:
+            self._ensure_visible()
+            rows = self._conn.execute(sql, (first if last is None else last, group_id, batch_size)).fetchall()
+        if not rows:
+            return [], last
+        page = []
+        for row in rows:
+            data = dict(row)
+            data.pop("id", None)
+            page.append(data)
+        return page, rows[-1][cursor_col]
+
+    def import_rows(self, table: str, rows: List[tuple], policy: str = "overwrite"):
+        """用 executemany 在一个事务中写入一批由 _iter_import_batches 生成的行"""
+        with self._lock, self._conn as conn:
+            conn.executemany(_import_statement(table, policy), rows)
+
+    def clear_user_cache(self):
+        with self._lock:
+            self._user_cache.clear()
+
+
+class AsyncDatabase:
+    """
+    Database 的异步包装。
+    所有调用都提交到一个专用的数据库线程中按顺序执行（单写线程 + 请求队列），
+    协程只等待结果，锁等待或慢磁盘不会阻塞事件循环。
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="multigroup-db")
+        self._tasks: List[asyncio.Task] = []
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def start_flush_loop(self, interval: float):
+        """延迟写入模式下，按固定间隔提交缓冲区"""
+        self._tasks.append(asyncio.create_task(self._flush_loop(interval)))
+
+    async def _flush_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"批量提交数据库写入失败: {e}")
+
+    async def flush(self) -> int:
+        return await self._run(self.db.flush)
+
+    def start_mute_retention(self, retention_days: int, batch_size: int = 500,
+                             archive_path: Optional[Path] = None, interval: float = MUTE_RETENTION_INTERVAL):
+        """定期把超过保留天数的禁言记录汇总后删除/归档"""
+        self._tasks.append(asyncio.create_task(
+            self._mute_retention_loop(retention_days, batch_size, archive_path, interval)
+        ))
+
+    async def _mute_retention_loop(self, retention_days: int, batch_size: int,
+                                   archive_path: Optional[Path], interval: float):
+        while True:
+            try:
+                cutoff = int(datetime.now().timestamp()) - retention_days * 86400
+                total = 0
+                # 小批量多次执行，每批之间让出数据库线程给其他请求
+                while True:
+                    pruned = await self._run(self.db.prune_mutes, cutoff, batch_size, archive_path)
+                    total += pruned
+                    if pruned < batch_size:
+                        break
+                    await asyncio.sleep(0.1)
+                if total:
+                    logger.info(f"已清理 {total} 条超过 {retention_days} 天的禁言记录")
+            except Exception as e:
+                logger.error(f"清理过期禁言记录失败: {e}")
+            await asyncio.sleep(interval)
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        # Database.close 会先提交缓冲区中剩余的写入
+        await self._run(self.db.close)
+        self._executor.shutdown(wait=True)
+
+    # ---------- 用户相关 ----------
+    async def get_user(self, group_id: str, user_id: str) -> Dict[str, Any]:
+        return await self._run(self.db.get_user, group_id, user_id)
+
+    async def update_user(self, group_id: str, user_id: str, **kwargs):
+        return await self._run(self.db.update_user, group_id, user_id, **kwargs)
+
+    async def add_points(self, group_id: str, user_id: str, points: int):
+        return await self._run(self.db.add_points, group_id, user_id, points)
+
+    async def apply_sign(self, group_id: str, user_id: str, now: int, cutoff: int, streak_window: int,
+                         points_gain: int, bonus_days: List[int]) -> Optional[Dict[str, Any]]:
+        return await self._run(self.db.apply_sign, group_id, user_id, now, cutoff, streak_window,
+                               points_gain, bonus_days)
+
+    async def stats(self) -> Dict[str, int]:
+        return await self._run(self.db.stats)
+
+    # ---------- 商店相关 ----------
+    async def get_shop_items(self) -> List[Dict]:
+        return await self._run(self.db.get_shop_items)
+
+    async def get_item(self, item_id: int) -> Optional[Dict]:
+        return await self._run(self.db.get_item, item_id)
+
+    async def add_item(self, name: str, price: int, description: str = "",
+                       daily_limit: int = 0, total_limit: int = 0, data: str = "{}"):
+        return await self._run(self.db.add_item, name, price, description, daily_limit, total_limit, data)
+
+    async def update_item(self, item_id: int, **kwargs):
+        return await self._run(self.db.update_item, item_id, **kwargs)
+
+    async def delete_item(self, item_id: int):
+        return await self._run(self.db.delete_item, item_id)
+
+    async def reset_daily_limits(self):
+        return await self._run(self.db.reset_daily_limits)
+
+    async def add_purchase(self, user_id: str, item_id: int, quantity: int = 1) -> int:
+        return await self._run(self.db.add_purchase, user_id, item_id, quantity)
+
+    async def get_user_purchases(self, user_id: str, item_id: Optional[int] = None) -> List[Dict]:
+        return await self._run(self.db.get_user_purchases, user_id, item_id)
+
+    async def mark_card_used(self, purchase_id: int):
+        return await self._run(self.db.mark_card_used, purchase_id)
+
+    # ---------- 禁言记录 ----------
+    async def add_mute_record(self, user_id: str, group_id: str, operator: str, reason: str,
+                              duration: int, start_time: int, end_time: int):
+        return await self._run(self.db.add_mute_record, user_id, group_id, operator, reason,
+                               duration, start_time, end_time)
+
+    async def get_latest_mute(self, user_id: str, group_id: Optional[str] = None) -> Optional[Dict]:
+        return await self._run(self.db.get_latest_mute, user_id, group_id)
+
+    async def get_mute_summary(self, group_id: str, user_id: str) -> Dict[str, int]:
+        return await self._run(self.db.get_mute_summary, group_id, user_id)
+
+    # ---------- 排行榜 ----------
+    async def get_points_rank(self, group_id: str, limit: int = 20) -> List[Tuple[str, int]]:
+        return await self._run(self.db.get_points_rank, group_id, limit)
+
+    async def get_sign_rank(self, group_id: str, limit: int = 20) -> List[Tuple[str, int]]:
+        return await self._run(self.db.get_sign_rank, group_id, limit)
+
+    async def get_card_usage_rank(self, group_id: str, limit: int = 20) -> List[Tuple[str, int]]:
+        return await self._run(self.db.get_card_usage_rank, group_id, limit)
+
+    async def get_user_rank(self, group_id: str, user_id: str, metric: str = "points",
+                            neighbours: bool = False) -> Dict[str, Any]:
+        return await self._run(self.db.get_user_rank, group_id, user_id, metric, neighbours)
+
+    # ---------- 群数据导入导出 ----------
+    # 导入导出不作为一个整体提交到数据库线程：每页读取、每批写入各是一次 _run，
+    # 中间的签到、查询等请求可以插队执行；文件读写和 JSON 编解码放在 to_thread 中进行。
+    async def export_group(self, group_id: str, path: Path,
+                           batch_size: int = EXPORT_BATCH_SIZE) -> Dict[str, int]:
+        """把一个群的数据以 JSONL 流式写入文件，首行为元信息，返回各表行数；内存占用与总行数无关"""
+        counts = {table: 0 for table in TRANSFER_COLUMNS}
+        f = await asyncio.to_thread(open, path, "w", encoding="utf-8")
+        try:
+            await asyncio.to_thread(f.write, _export_header(group_id))
+            for table in TRANSFER_COLUMNS:
+                last = None
+                while True:
+                    page, last = await self._run(self.db.read_group_page, group_id, table, last, batch_size)
+                    if not page:
+                        break
+                    await asyncio.to_thread(_write_export_rows, f, table, page)
+                    counts[table] += len(page)
+        finally:
+            await asyncio.to_thread(f.close)
+        return counts
+
+    async def import_group(self, path: Path, group_id: str, policy: str = "overwrite",
+                           batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, int]:
+        """
+        从 export_group 生成的 JSONL 文件流式导入到指定群（群号以导入目标为准）。
+        每攒满 batch_size 行用 executemany 在一个事务中提交。
+        :param policy: users 已存在时的处理方式：overwrite 覆盖 / add 积分与次数累加 / skip 跳过；
+                       mutes、purchases 总是追加，已存在的相同记录会被跳过，重复导入不会产生重复数据
+        :return: 各表读取的行数
+        """
+        if policy not in IMPORT_POLICIES:
+            raise ValueError(f"不支持的导入策略: {policy}")
+        counts = {table: 0 for table in TRANSFER_COLUMNS}
+        await self.flush()
+        batches = _iter_import_batches(path, group_id, batch_size)
+        try:
+            while True:
+                item = await asyncio.to_thread(next, batches, None)
+                if item is None:
+                    break
+                table, rows = item
+                await self._run(self.db.import_rows, table, rows, policy)
+                counts[table] += len(rows)
+        finally:
+            batches.close()
+            # 导入直接改写了 users 表，丢弃缓存避免读到旧值
+            await self._run(self.db.clear_user_cache)
+        return counts
@@ -0,0 +1,237 @@
+# coer/image_assets.py
+"""
+图片生成器共用的资源缓存。
+背景图在每次渲染中都要解码、缩放、模糊，结果却只取决于文件和参数，
+因此按参数缓存处理好的底图，每次渲染只拿一份副本；
+字体按 (路径, 字号) 在进程内只加载一次，由所有生成器共享。
+"""
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Optional, Tuple
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from astrbot.api import logger
+
+# 同时保留的底图数量（不同背景 / 模糊半径 / 模式的组合）
+BACKGROUND_CACHE_SIZE = 8
+
+# 内存中保留的圆形头像贴图数量，以及磁盘上最多保留的贴图文件数
+AVATAR_TILE_CACHE_SIZE = 256
+AVATAR_TILE_DISK_ITEMS = 4096
+
+# 生成图片的交付方式：bytes 直接以内存数据发送，file 写入临时目录后发送路径
+OUTPUT_MODES = ("bytes", "file")
+
+# 配置中的格式名 -> (Pillow 格式, 文件扩展名)
+IMAGE_FORMATS = {
+    "PNG": ("PNG", "png"),
+    "JPEG": ("JPEG", "jpg"),
+    "WEBP": ("WEBP", "webp"),
+}
+
+
+@dataclass(frozen=True)
+class EncodeOptions:
+    """生成图片的编码参数"""
+    format: str = "PNG"
+    quality: int = 85
+    # 输出前的缩放比例，1.0 表示保持原尺寸
+    scale: float = 1.0
+
+    @classmethod
+    def from_config(cls, fmt: str, quality: int, scale: float) -> "EncodeOptions":
+        fmt = (fmt or "PNG").upper()
+        if fmt not in IMAGE_FORMATS:
+            logger.warning(f"不支持的图片格式 {fmt}，使用 PNG")
+            fmt = "PNG"
+        return cls(fmt, max(1, min(100, int(quality))), max(0.1, min(1.0, float(scale))))
+
+    @property
+    def extension(self) -> str:
+        return IMAGE_FORMATS[self.format][1]
+
+_background_cache: "OrderedDict[tuple, Image.Image]" = OrderedDict()
+_background_lock = threading.Lock()
+
+_font_cache: dict = {}
+_font_lock = threading.Lock()
+_font_warned = set()
+
+_tile_cache: "OrderedDict[tuple, Image.Image]" = OrderedDict()
+_tile_lock = threading.Lock()
+_tile_writes = 0
+
+
+def asset_version(path: str) -> tuple:
+    """资源文件的版本标识：路径、修改时间和大小，文件被替换后随之变化"""
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def get_background(path: str, size: Tuple[int, int], blur_radius: int = 0,
+                   mode: Optional[str] = None) -> Image.Image:
+    """
+    获取缩放并模糊后的背景图副本。
+    缓存键包含文件路径、修改时间和大小，背景文件被替换或模糊参数变化时自动使用新底图。
+    :param mode: 需要转换的颜色模式（如 "RGBA"），为空时保持原图模式
+    """
+    key = asset_version(path) + (tuple(size), blur_radius, mode)
+    with _background_lock:
+        base = _background_cache.get(key)
+        if base is not None:
+            _background_cache.move_to_end(key)
+            return base.copy()
+
+    with Image.open(path) as img:
+        src = img.convert(mode) if mode else img
+        base = src.resize(size)
+    if blur_radius > 0:
+        base = base.filter(ImageFilter.GaussianBlur(radius=blur_radius))
+
+    with _background_lock:
+        _background_cache[key] = base
+        _background_cache.move_to_end(key)
+        while len(_background_cache) > BACKGROUND_CACHE_SIZE:
+            _background_cache.popitem(last=False)
+    return base.copy()
+
+
+def clear_background_cache():
+    with _background_lock:
+        _background_cache.clear()
+
+
+def get_font(path: str, size: int):
+    """
+    获取字体，每个 (路径, 字号) 只解析一次。
+    字体文件缺失或无法加载时只记录一次警告，之后直接返回默认字体。
+    """
+    key = (path, size)
+    font = _font_cache.get(key)
+    if font is not None:
+        return font
+    with _font_lock:
+        font = _font_cache.get(key)
+        if font is not None:
+            return font
+        try:
+            font = ImageFont.truetype(path, size)
+        except OSError as e:
+            if path not in _font_warned:
+                _font_warned.add(path)
+                logger.warning(f"字体文件不可用，使用默认字体: {path}（{e}）")
+            font = ImageFont.load_default()
+        _font_cache[key] = font
+        return font
+
+
+@functools.lru_cache(maxsize=8)
+def circle_mask(size: Tuple[int, int]) -> Image.Image:
+    """圆形蒙版，每个尺寸只生成一次（putalpha 会复制蒙版数据，共享同一份是安全的）"""
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, size[0], size[1]), fill=255)
+    return mask
+
+
+def get_avatar_tile(data: bytes, size: Tuple[int, int] = (200, 200),
+                    cache_dir: Optional[str] = None) -> Image.Image:
+    """
+    把头像原图处理成可直接粘贴的圆形 RGBA 贴图。
+    按头像内容哈希缓存：内存 LRU 命中时直接返回，其次读取 cache_dir 中的贴图文件，
+    都没有时才解码原图、缩放并加蒙版。返回的贴图是共享对象，只能用于 paste，不要修改。
+    """
+    global _tile_writes
+    size = tuple(size)
+    digest = hashlib.sha1(data).hexdigest()
+    key = (digest, size)
+    with _tile_lock:
+        tile = _tile_cache.get(key)
+        if tile is not None:
+            _tile_cache.move_to_end(key)
+            return tile
+
+    tile = None
+    tile_path = os.path.join(cache_dir, f"{digest}_{size[0]}x{size[1]}.png") if cache_dir else None
+    if tile_path and os.path.exists(tile_path):
+        try:
+            with Image.open(tile_path) as img:
+                tile = img.convert("RGBA")
+        except OSError as e:
+            logger.warning(f"读取头像贴图缓存失败: {e}")
+    if tile is None:
+        with Image.open(BytesIO(data)) as img:
+            tile = img.convert("RGBA").resize(size)
+        tile.putalpha(circle_mask(size))
+        if tile_path:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp = f"{tile_path}.{threading.get_ident()}.tmp"
+                tile.save(tmp, format="PNG")
+                os.replace(tmp, tile_path)
+                _tile_writes += 1
+                if _tile_writes % 64 == 0:
+                    _trim_tile_dir(cache_dir)
+            except OSError as e:
+                logger.warning(f"写入头像贴图缓存失败: {e}")
+
+    with _tile_lock:
+        _tile_cache[key] = tile
+        while len(_tile_cache) > AVATAR_TILE_CACHE_SIZE:
+            _tile_cache.popitem(last=False)
+    return tile
+
+
+def _trim_tile_dir(cache_dir: str):
+    # 头像更换后旧贴图不会再被命中，超出数量时删除最旧的文件
+    files = sorted((e.stat().st_mtime, e.path) for e in os.scandir(cache_dir) if e.name.endswith(".png"))
+    for _, path in files[:max(0, len(files) - AVATAR_TILE_DISK_ITEMS)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def encode_image(img: Image.Image, options: Optional[EncodeOptions] = None) -> bytes:
+    """
+    按编码参数把渲染结果编码为字节。
+    JPEG 不支持透明通道，编码前转为 RGB；PNG 保持 Pillow 默认压缩级别（optimize 体积只小约 1%，耗时却翻几倍）。
+    """
+    options = options or EncodeOptions()
+    if options.scale < 1.0:
+        size = (max(1, round(img.width * options.scale)), max(1, round(img.height * options.scale)))
+        img = img.resize(size, Image.BICUBIC)
+    buf = BytesIO()
+    if options.format == "JPEG":
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.save(buf, format="JPEG", quality=options.quality, optimize=True)
+    elif options.format == "WEBP":
+        img.save(buf, format="WEBP", quality=options.quality, method=4)
+    else:
+        img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def write_output(temp_dir: str, prefix: str, data: bytes, extension: str = "png") -> str:
+    """
+    把编码好的图片写入临时目录并返回路径。
+    文件名取内容哈希，同样的图片只写一次，并发生成的不同图片也不会互相覆盖。
+    复用已有文件时刷新修改时间，避免缓存命中返回的文件已超过保留时间、在发送前被清理掉。
+    """
+    os.makedirs(temp_dir, exist_ok=True)
+    digest = hashlib.sha1(data).hexdigest()[:16]
+    out_path = os.path.join(temp_dir, f"{prefix}_{digest}.{extension}")
+    try:
+        os.utime(out_path)
+        return out_path
+    except FileNotFoundError:
+        pass
+    tmp = f"{out_path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, out_path)
+    return out_path
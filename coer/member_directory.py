@@ -0,0 +1,177 @@
+# coer/member_directory.py
+"""
+群成员目录缓存。
+每个群只拉取一次 get_group_member_list，按QQ号和名片/昵称建立索引，
+昵称显示和 “@昵称” 解析都变成本地字典查询；
+超过 TTL 后继续返回旧数据，同时在后台刷新；
+成员进群、退群、改名片的通知到达时只更新对应成员。
+“@昵称” 只按显示名（有群名片用群名片，否则用昵称）匹配，与群里看到的名字一致，
+不会匹配到被群名片盖住的 QQ 昵称。
+"""
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from astrbot.api import logger
+from .utils import get_nickname, get_nicknames
+
+# 拉取整个成员列表的超时（秒）
+MEMBER_LIST_TIMEOUT = 10.0
+# 会触发目录更新的群通知类型
+MEMBER_NOTICE_TYPES = ("group_increase", "group_decrease", "group_card")
+
+
+class _GroupMembers:
+    def __init__(self, members: List[dict]):
+        self.loaded_at = time.time()
+        # QQ号 -> (群名片, 昵称)
+        self.members: Dict[str, Tuple[str, str]] = {}
+        # 显示名（群名片，没有则为昵称）-> QQ号列表
+        self.by_display: Dict[str, List[str]] = {}
+        for member in members:
+            uid = str(member.get("user_id", ""))
+            if uid:
+                self.put(uid, (member.get("card") or "").strip(), (member.get("nickname") or "").strip())
+
+    def display_name(self, uid: str) -> str:
+        card, nickname = self.members[uid]
+        return card or nickname or uid
+
+    def put(self, uid: str, card: str, nickname: str):
+        self.remove(uid)
+        self.members[uid] = (card, nickname)
+        display = card or nickname
+        if display:
+            self.by_display.setdefault(display, []).append(uid)
+
+    def remove(self, uid: str):
+        old = self.members.pop(uid, None)
+        if old is None:
+            return
+        display = old[0] or old[1]
+        uids = self.by_display.get(display)
+        if uids and uid in uids:
+            uids.remove(uid)
+            if not uids:
+                del self.by_display[display]
+
+
+class MemberDirectory:
+    def __init__(self, ttl: int = 600):
+        """
+        :param ttl: 成员列表的刷新周期（秒），0 表示不缓存，每次都直接查询
+        """
+        self.ttl = ttl
+        self._groups: Dict[str, _GroupMembers] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    async def _fetch(self, bot, group_id: str) -> Optional[_GroupMembers]:
+        try:
+            members = await asyncio.wait_for(
+                bot.get_group_member_list(group_id=int(group_id)), MEMBER_LIST_TIMEOUT
+            )
+        except Exception as e:
+            logger.error(f"获取群成员列表失败: {e}")
+            return None
+        return _GroupMembers(members or [])
+
+    async def _refresh(self, bot, group_id: str) -> Optional[_GroupMembers]:
+        entry = await self._fetch(bot, group_id)
+        if entry is not None:
+            self._groups[group_id] = entry
+            return entry
+        old = self._groups.get(group_id)
+        if old is not None:
+            # 刷新失败时继续用旧数据，下个周期再试
+            old.loaded_at = time.time()
+        return old
+
+    def _load(self, bot, group_id: str) -> asyncio.Task:
+        # 同一个群同时只拉取一次，并发请求共用同一个任务
+        task = self._loading.get(group_id)
+        if task is None:
+            task = asyncio.create_task(self._refresh(bot, group_id))
+            self._loading[group_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(group_id, None))
+        return task
+
+    async def _get(self, bot, group_id: str) -> Optional[_GroupMembers]:
+        group_id = str(group_id)
+        entry = self._groups.get(group_id)
+        if entry is None:
+            return await asyncio.shield(self._load(bot, group_id))
+        if time.time() - entry.loaded_at >= self.ttl:
+            # 过期后先返回旧数据，后台刷新
+            self._load(bot, group_id)
+        return entry
+
+    async def nickname(self, event, user_id: str) -> str:
+        if not self.enabled:
+            return await get_nickname(event, user_id)
+        names = await self.nicknames(event, [user_id])
+        return names[user_id]
+
+    async def nicknames(self, event, user_ids: Iterable[str]) -> Dict[str, str]:
+        """批量获取显示名；目录中没有的成员（如刚进群）单独查询后补进目录"""
+        user_ids = list(dict.fromkeys(str(uid) for uid in user_ids))
+        if not self.enabled:
+            return await get_nicknames(event, user_ids)
+        group_id = str(event.get_group_id())
+        entry = await self._get(event.bot, group_id)
+        if entry is None:
+            return await get_nicknames(event, user_ids)
+        result = {uid: entry.display_name(uid) for uid in user_ids if uid in entry.members}
+        missing = [uid for uid in user_ids if uid not in result]
+        if missing:
+            fetched = await get_nicknames(event, missing)
+            for uid, name in fetched.items():
+                # 查不到的（如已退群）也记下，直到下次整体刷新前不再逐个查询
+                entry.put(uid, name if name != uid else "", "")
+            result.update(fetched)
+        return result
+
+    async def find_by_name(self, event, name: str) -> Optional[List[str]]:
+        """按显示名（群名片优先，没有群名片时用昵称）查找QQ号；成员列表获取失败时返回 None"""
+        if not self.enabled:
+            entry = await self._fetch(event.bot, str(event.get_group_id()))
+        else:
+            entry = await self._get(event.bot, str(event.get_group_id()))
+        if entry is None:
+            return None
+        return list(entry.by_display.get(name, []))
+
+    def handle_notice(self, raw: dict):
+        """处理进群/退群/改名片通知，只更新对应成员"""
+        notice_type = raw.get("notice_type")
+        if notice_type not in MEMBER_NOTICE_TYPES:
+            return
+        group_id = str(raw.get("group_id", ""))
+        uid = str(raw.get("user_id", ""))
+        if notice_type == "group_decrease" and (raw.get("sub_type") == "kick_me" or uid == str(raw.get("self_id", ""))):
+            # 机器人自己退群或被踢，整个群的目录都不再需要
+            self.invalidate(group_id)
+            return
+        entry = self._groups.get(group_id)
+        if entry is None or not uid:
+            return
+        if notice_type == "group_card":
+            _, nickname = entry.members.get(uid, ("", ""))
+            entry.put(uid, (raw.get("card_new") or "").strip(), nickname)
+        else:
+            # 退群直接删除；进群的新成员在下次查询时单独获取
+            entry.remove(uid)
+
+    def invalidate(self, group_id: Optional[str] = None):
+        """丢弃某个群（为空时为全部群）的目录，下次查询时重新拉取"""
+        if group_id is None:
+            self._groups.clear()
+        else:
+            self._groups.pop(str(group_id), None)
+
+    def stop(self):
+        for task in list(self._loading.values()):
+            task.cancel()
+        self._loading.clear()
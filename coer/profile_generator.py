@@ -1,87 +1,57 @@
+import asyncio
 import os
-import time
-import aiohttp
-from io import BytesIO
-from pathlib import Path
-from typing import List, Tuple, Optional
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from typing import List, Tuple, Optional, Union
+from PIL import ImageDraw
 from astrbot.api import logger
+from .avatar_cache import AvatarCache
+from .quote_service import QuoteService
+from .image_assets import OUTPUT_MODES, EncodeOptions, encode_image, get_avatar_tile, get_background, get_font, write_output
+from .render_pool import RenderPool
+from .temp_storage import TempStorage
+
+def _rank_text(rank) -> str:
+    """名次为数字时显示 “第 N 名”，否则（未上榜、查询失败）直接显示原文字"""
+    if isinstance(rank, int):
+        return f"第 {rank} 名"
+    return str(rank or "未上榜")
+
 
 class ProfileImageGenerator:
-    def __init__(self, plugin_dir: str, data_dir: str, bg_file: str, font_file: str, blur_radius: int = 2):
+    def __init__(self, plugin_dir: str, data_dir: str, bg_file: str, font_file: str, blur_radius: int = 2,
+                 render_pool: Optional[RenderPool] = None, output: str = "bytes",
+                 temp_storage: Optional[TempStorage] = None, encoding: Optional[EncodeOptions] = None,
+                 avatar_cache: Optional[AvatarCache] = None, quote_service: Optional[QuoteService] = None):
         self.plugin_dir = plugin_dir
         self.data_dir = data_dir
         self.bg_path = os.path.join(plugin_dir, 'assets', bg_file)
         self.font_path = os.path.join(plugin_dir, 'assets', font_file)
         self.bg_size = (1640, 856)
         self.blur_radius = blur_radius
-
-        # 头像缓存目录
-        self.avatar_cache_dir = Path(data_dir) / "avatar_cache"
-        self.avatar_cache_dir.mkdir(parents=True, exist_ok=True)
-        self.cache_expire = 7 * 24 * 3600
+        self.render_pool = render_pool or RenderPool()
+        # bytes：返回编码后的图片数据；file：写入临时目录并返回路径
+        if output not in OUTPUT_MODES:
+            raise ValueError(f"不支持的图片输出方式: {output}")
+        self.output = output
+        self.temp_storage = temp_storage or TempStorage(os.path.join(data_dir, "temp"))
+        self.encoding = encoding or EncodeOptions()
+
+        self.avatar_cache = avatar_cache or AvatarCache(os.path.join(data_dir, "avatar_cache"))
+        # 处理好的圆形头像贴图，按头像内容哈希命名
+        self.avatar_tile_dir = os.path.join(data_dir, "avatar_tiles")
+        self.avatar_size = (200, 200)
+        self.quote_service = quote_service
 
     def _load_font(self, size: int):
-        try:
-            if os.path.exists(self.font_path):
-                return ImageFont.truetype(self.font_path, size)
-        except:
-            pass
-        return ImageFont.load_default()
-
-    async def _download_avatar(self, user_id: str) -> Optional[BytesIO]:
-        cache_file = self.avatar_cache_dir / f"{user_id}.jpg"
-        if cache_file.exists():
-            mtime = cache_file.stat().st_mtime
-            if time.time() - mtime < self.cache_expire:
-                try:
-                    return BytesIO(cache_file.read_bytes())
-                except Exception as e:
-                    logger.warning(f"读取缓存头像失败: {e}，将重新下载")
+        return get_font(self.font_path, size)
 
-        url = f"https://q1.qlogo.cn/g?b=qq&nk={user_id}&s=640"
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        data = await resp.read()
-                        cache_file.write_bytes(data)
-                        return BytesIO(data)
-                    else:
-                        logger.error(f"下载头像失败，HTTP {resp.status}")
-        except Exception as e:
-            logger.error(f"下载头像异常: {e}")
-
-        if cache_file.exists():
-            logger.warning(f"头像下载失败，使用过期缓存: {user_id}")
-            return BytesIO(cache_file.read_bytes())
-        return None
-
-    async def _get_daily_quote(self, config) -> str:
-        if config.quote_source == "固定文本":
-            return config.fixed_quote if config.fixed_quote else "✨ 今日份的寄语 ✨"
-        else:
-            try:
-                headers = {"Accept-Encoding": "gzip, deflate"}
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(config.api_url, headers=headers) as resp:
-                        if resp.status == 200:
-                            data = await resp.json()
-                            path = config.api_json_path.split('.')
-                            value = data
-                            for key in path:
-                                if isinstance(value, dict):
-                                    value = value.get(key, "")
-                                else:
-                                    value = ""
-                                    break
-                            if value:
-                                return str(value)
-                        else:
-                            logger.error(f"一言API返回 {resp.status}")
-            except Exception as e:
-                logger.error(f"获取一言API异常: {e}")
-            return "✨ 今日份的寄语 ✨"
+    async def fetch_avatar(self, user_id: str) -> Optional[bytes]:
+        return await self.avatar_cache.get(user_id)
+
+    async def fetch_quote(self, config, group_id: str = "") -> str:
+        if self.quote_service is None:
+            self.quote_service = QuoteService(config)
+            self.quote_service.start()
+        return await self.quote_service.get(group_id)
 
     async def create_profile_image(
         self,
@@ -91,16 +61,46 @@ class ProfileImageGenerator:
         sign_count: int,
         items: List[Tuple[str, int]],
         rank_info: dict,
-        config
-    ) -> Optional[str]:
+        config,
+        group_id: str = "",
+        assets: Optional[Tuple[str, Optional[bytes]]] = None
+    ) -> Optional[Union[bytes, str]]:
+        """
+        :param assets: 调用方已获取好的 (一言, 头像数据)；不传时在这里同时获取两者
+        """
         if not os.path.exists(self.bg_path):
             logger.error(f"背景图不存在: {self.bg_path}")
             return None
 
+        # 网络请求留在事件循环里，拿到素材后再交给渲染池绘制
+        if assets is None:
+            assets = await asyncio.gather(self.fetch_quote(config, group_id), self.fetch_avatar(user_id))
+        daily_quote, avatar_data = assets
+        data = await self.render_pool.run(
+            self._render_profile_image, user_id, nickname, points, sign_count, items, rank_info,
+            daily_quote, avatar_data, config.title_color, config.text_color
+        )
+        if data and self.output == "file":
+            return await asyncio.to_thread(
+                write_output, self.temp_storage.output_dir, f"profile_{user_id}", data, self.encoding.extension
+            )
+        return data
+
+    def _render_profile_image(
+        self,
+        user_id: str,
+        nickname: str,
+        points: int,
+        sign_count: int,
+        items: List[Tuple[str, int]],
+        rank_info: dict,
+        daily_quote: str,
+        avatar_data: Optional[bytes],
+        title_color: str,
+        text_color: str
+    ) -> Optional[bytes]:
         try:
-            bg = Image.open(self.bg_path).convert("RGBA").resize(self.bg_size)
-            if self.blur_radius > 0:
-                bg = bg.filter(ImageFilter.GaussianBlur(radius=self.blur_radius))
+            bg = get_background(self.bg_path, self.bg_size, self.blur_radius, mode="RGBA")
             draw = ImageDraw.Draw(bg)
 
             font_large = self._load_font(48)
@@ -109,22 +109,12 @@ class ProfileImageGenerator:
             rank_title_font = self._load_font(32)
             rank_item_font = self._load_font(28)
 
-            title_color = config.title_color
-            text_color = config.text_color
-
-            daily_quote = await self._get_daily_quote(config)
-
-            avatar_io = await self._download_avatar(user_id)
-            if avatar_io:
-                avatar = Image.open(avatar_io).convert("RGBA")
-                avatar_size = (200, 200)
-                avatar = avatar.resize(avatar_size)
-                mask = Image.new("L", avatar_size, 0)
-                mask_draw = ImageDraw.Draw(mask)
-                mask_draw.ellipse((0, 0, avatar_size[0], avatar_size[1]), fill=255)
-                avatar.putalpha(mask)
-            else:
-                avatar = None
+            avatar = None
+            if avatar_data:
+                try:
+                    avatar = get_avatar_tile(avatar_data, self.avatar_size, self.avatar_tile_dir)
+                except Exception as e:
+                    logger.warning(f"头像处理失败，使用默认头像: {e}")
 
             # 计算整个内容块的高度
             avatar_height = 200
@@ -170,16 +160,16 @@ class ProfileImageGenerator:
             rank_width = 400
             rank_x_positions = [80, 80 + rank_width, 80 + 2*rank_width]
             draw.text((rank_x_positions[0], y), "🏆 积分榜", font=rank_title_font, fill=title_color)
-            rank_points = rank_info.get("points_rank", "未上榜")
-            draw.text((rank_x_positions[0], y + 40), f"第 {rank_points} 名", font=rank_item_font, fill=text_color)
+            rank_points = _rank_text(rank_info.get("points_rank"))
+            draw.text((rank_x_positions[0], y + 40), rank_points, font=rank_item_font, fill=text_color)
 
             draw.text((rank_x_positions[1], y), "📅 签到榜", font=rank_title_font, fill=title_color)
-            rank_sign = rank_info.get("sign_rank", "未上榜")
-            draw.text((rank_x_positions[1], y + 40), f"第 {rank_sign} 名", font=rank_item_font, fill=text_color)
+            rank_sign = _rank_text(rank_info.get("sign_rank"))
+            draw.text((rank_x_positions[1], y + 40), rank_sign, font=rank_item_font, fill=text_color)
 
             draw.text((rank_x_positions[2], y), "🃏 使用榜", font=rank_title_font, fill=title_color)
-            rank_use = rank_info.get("use_rank", "未上榜")
-            draw.text((rank_x_positions[2], y + 40), f"第 {rank_use} 名", font=rank_item_font, fill=text_color)
+            rank_use = _rank_text(rank_info.get("use_rank"))
+            draw.text((rank_x_positions[2], y + 40), rank_use, font=rank_item_font, fill=text_color)
 
             y += 40 + 28 + spacing
 
@@ -188,11 +178,7 @@ class ProfileImageGenerator:
             quote_w = bbox[2] - bbox[0]
             draw.text(((self.bg_size[0] - quote_w)/2, y), daily_quote, font=font_medium, fill=text_color)
 
-            temp_dir = os.path.join(self.data_dir, "temp")
-            os.makedirs(temp_dir, exist_ok=True)
-            out_path = os.path.join(temp_dir, f"profile_{user_id}_{int(time.time())}.png")
-            bg.save(out_path)
-            return out_path
+            return encode_image(bg, self.encoding)
 
         except Exception as e:
             logger.error(f"生成个人信息图片失败: {e}")
@@ -0,0 +1,126 @@
+# coer/quote_service.py
+"""
+每日一言服务。
+后台预先拉取一批一言放进池子，生成个人信息时直接从池中取，不在渲染路径上等待网络；
+“每群每天” 模式下同一个群当天始终显示同一句。
+接口超时或不可用时立即返回上一句成功获取的内容（没有则用默认文案），并在后台补充。
+"""
+import asyncio
+from collections import deque
+from datetime import date
+from typing import Dict, Optional, Tuple
+import aiohttp
+from astrbot.api import logger
+
+DEFAULT_QUOTE = "✨ 今日份的寄语 ✨"
+# 后台检查池子余量的间隔（秒）
+QUOTE_REFILL_INTERVAL = 300
+# 连续失败时两次请求之间的等待（秒）
+QUOTE_RETRY_DELAY = 30
+
+
+class QuoteService:
+    def __init__(self, config, pool_size: int = 8, timeout: float = 3.0, per_group_daily: bool = True):
+        """
+        :param config: 插件配置，读取 quote_source / fixed_quote / api_url / api_json_path
+        :param pool_size: 预取的一言条数
+        :param timeout: 单次请求一言接口的超时（秒）
+        :param per_group_daily: 同一个群每天只换一次
+        """
+        self.config = config
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.per_group_daily = per_group_daily
+        self._pool: deque = deque(maxlen=self.pool_size)
+        # 群号 -> (日期, 当天的一言)
+        self._assigned: Dict[str, Tuple[date, str]] = {}
+        self._last: Optional[str] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._counters = {"hits": 0, "misses": 0, "fetched": 0, "failures": 0}
+
+    @property
+    def uses_api(self) -> bool:
+        return self.config.quote_source != "固定文本"
+
+    def start(self):
+        if self.uses_api and self._task is None:
+            self._task = asyncio.create_task(self._refill_loop())
+
+    async def get(self, group_id: str = "") -> str:
+        if not self.uses_api:
+            return self.config.fixed_quote or DEFAULT_QUOTE
+        if self.per_group_daily:
+            today = date.today()
+            assigned = self._assigned.get(group_id)
+            if assigned and assigned[0] == today:
+                self._counters["hits"] += 1
+                return assigned[1]
+        if len(self._pool) <= self.pool_size // 2:
+            self._wakeup.set()
+        if not self._pool:
+            # 池子空了（接口不可用或刚启动），立即降级，不等待网络；
+            # 降级内容不记为当天的一言，池子补上后再分配
+            self._counters["misses"] += 1
+            return self._last or DEFAULT_QUOTE
+        self._counters["hits"] += 1
+        quote = self._pool.popleft()
+        if self.per_group_daily:
+            self._forget_old_days()
+            self._assigned[group_id] = (date.today(), quote)
+        return quote
+
+    def _forget_old_days(self):
+        today = date.today()
+        for gid in [g for g, (d, _) in self._assigned.items() if d != today]:
+            del self._assigned[gid]
+
+    async def _fetch(self) -> Optional[str]:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        headers = {"Accept-Encoding": "gzip, deflate"}
+        try:
+            async with self._session.get(self.config.api_url, headers=headers) as resp:
+                if resp.status != 200:
+                    logger.error(f"一言API返回 {resp.status}")
+                    return None
+                data = await resp.json(content_type=None)
+        except Exception as e:
+            logger.error(f"获取一言API异常: {e}")
+            return None
+        value = data
+        for key in self.config.api_json_path.split('.'):
+            if isinstance(value, dict):
+                value = value.get(key, "")
+            else:
+                value = ""
+                break
+        return str(value) if value else None
+
+    async def _refill_loop(self):
+        while True:
+            while len(self._pool) < self.pool_size:
+                quote = await self._fetch()
+                if quote is None:
+                    self._counters["failures"] += 1
+                    await asyncio.sleep(QUOTE_RETRY_DELAY)
+                    continue
+                self._counters["fetched"] += 1
+                self._last = quote
+                self._pool.append(quote)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), QUOTE_REFILL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return dict(self._counters, pooled=len(self._pool))
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
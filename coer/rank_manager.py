@@ -1,137 +1,95 @@
+import asyncio
 import os
-import time
-from typing import List
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from typing import List, Optional, Union
+from PIL import ImageDraw
 from astrbot.api import logger
+from .image_assets import OUTPUT_MODES, EncodeOptions, asset_version, encode_image, get_background, get_font, write_output
+from .render_cache import RenderCache, render_key
+from .render_pool import RenderPool
+from .temp_storage import TempStorage
+from .text_layout import menu_layout, rank_layout
 
 class RankImageGenerator:
-    def __init__(self, plugin_dir: str, data_dir: str, bg_file: str, font_file: str):
+    def __init__(self, plugin_dir: str, data_dir: str, bg_file: str, font_file: str,
+                 render_pool: Optional[RenderPool] = None, render_cache: Optional[RenderCache] = None,
+                 output: str = "bytes", temp_storage: Optional[TempStorage] = None,
+                 encoding: Optional[EncodeOptions] = None):
         self.plugin_dir = plugin_dir
         self.data_dir = data_dir
         self.bg_path = os.path.join(plugin_dir, 'assets', bg_file)
         self.font_path = os.path.join(plugin_dir, 'assets', font_file)
         self.bg_size = (1640, 856)
+        self.render_pool = render_pool or RenderPool()
+        self.render_cache = render_cache or RenderCache()
+        # bytes：返回编码后的图片数据；file：写入临时目录并返回路径
+        if output not in OUTPUT_MODES:
+            raise ValueError(f"不支持的图片输出方式: {output}")
+        self.output = output
+        self.temp_storage = temp_storage or TempStorage(os.path.join(data_dir, "temp"))
+        self.encoding = encoding or EncodeOptions()
 
     def _load_font(self, size: int):
-        try:
-            if os.path.exists(self.font_path):
-                return ImageFont.truetype(self.font_path, size)
-        except:
-            pass
-        return ImageFont.load_default()
-
-    async def create_rank_image(self, title: str, lines: List[str], max_lines: int = 15,
-                                 blur_radius: int = 0, title_color: str = "#000000", text_color: str = "#000000") -> str:
+        return get_font(self.font_path, size)
+
+    def _cache_key(self, template: str, *params) -> str:
+        """渲染参数 + 背景和字体的版本，任一变化都会得到新的键"""
+        font_version = asset_version(self.font_path) if os.path.exists(self.font_path) else self.font_path
+        return render_key(template, asset_version(self.bg_path), font_version, self.bg_size, self.encoding, *params)
+
+    async def _render_cached(self, template: str, params: tuple, render, cache: bool = True) -> Union[bytes, str]:
+        """
+        :param cache: 是否经过渲染缓存；每次内容都不同的图片（如签到结果）传 False，
+                      避免一次性的图片把菜单、排行榜挤出缓存
+        """
         if not os.path.exists(self.bg_path):
             logger.error(f"背景图不存在: {self.bg_path}")
             return ""
-        try:
-            bg = Image.open(self.bg_path).resize(self.bg_size)
-            if blur_radius > 0:
-                bg = bg.filter(ImageFilter.GaussianBlur(radius=blur_radius))
-            draw = ImageDraw.Draw(bg)
-            title_font = self._load_font(48)
-            text_font = self._load_font(32)
-
-            # 计算标题高度
-            title_bbox = draw.textbbox((0, 0), title, font=title_font)
-            title_height = title_bbox[3] - title_bbox[1]
-
-            # 计算所有内容行的总高度
-            displayed = lines[:max_lines]
-            total_height = title_height + 20
-            line_heights = []
-            for line in displayed:
-                bbox = draw.textbbox((0, 0), line, font=text_font)
-                line_height = bbox[3] - bbox[1]
-                line_heights.append(line_height)
-                total_height += line_height + 10
-            if len(lines) > max_lines:
-                bbox = draw.textbbox((0, 0), f"... 共{len(lines)}人", font=text_font)
-                line_height = bbox[3] - bbox[1]
-                total_height += line_height + 10
-
-            # 计算起始Y坐标（垂直居中）
-            start_y = (self.bg_size[1] - total_height) // 2
-            y = start_y
-
-            # 绘制标题（水平居中）
-            title_bbox = draw.textbbox((0, 0), title, font=title_font)
-            title_w = title_bbox[2] - title_bbox[0]
-            draw.text(((self.bg_size[0] - title_w)/2, y), title, font=title_font, fill=title_color)
-            y += title_height + 20
-
-            # 绘制内容行
-            for i, line in enumerate(displayed):
-                draw.text((100, y), line, font=text_font, fill=text_color)
-                y += line_heights[i] + 10
+        if cache:
+            key = self._cache_key(template, *params)
+            data = await self.render_cache.get_or_render(key, lambda: self.render_pool.run(render, *params))
+        else:
+            data = await self.render_pool.run(render, *params)
+        if not data:
+            return ""
+        if self.output == "file":
+            return await asyncio.to_thread(write_output, self.temp_storage.output_dir, template, data, self.encoding.extension)
+        return data
 
-            if len(lines) > max_lines:
-                draw.text((100, y), f"... 共{len(lines)}人", font=text_font, fill=text_color)
+    async def create_rank_image(self, title: str, lines: List[str], max_lines: int = 15,
+                                 blur_radius: int = 0, title_color: str = "#000000", text_color: str = "#000000",
+                                 cache: bool = True) -> Union[bytes, str]:
+        return await self._render_cached(
+            "rank", (title, list(lines), max_lines, blur_radius, title_color, text_color), self._render_rank_image,
+            cache
+        )
+
+    def _render_rank_image(self, title: str, lines: List[str], max_lines: int,
+                           blur_radius: int, title_color: str, text_color: str) -> Optional[bytes]:
+        try:
+            bg = get_background(self.bg_path, self.bg_size, blur_radius)
+            layout = rank_layout(self.bg_size, title, lines, max_lines, self._load_font(48), self._load_font(32))
+            layout.draw(ImageDraw.Draw(bg), title_color, text_color)
 
-            temp_dir = os.path.join(self.data_dir, "temp")
-            os.makedirs(temp_dir, exist_ok=True)
-            out_path = os.path.join(temp_dir, f"rank_{int(time.time())}.png")
-            bg.save(out_path)
-            return out_path
+            return encode_image(bg, self.encoding)
         except Exception as e:
             logger.error(f"生成排行榜图片失败: {e}")
-            return ""
+            return None
 
     async def create_menu_image(self, title: str, lines: List[str],
-                                 blur_radius: int = 0, title_color: str = "#000000", text_color: str = "#000000") -> str:
-        if not os.path.exists(self.bg_path):
-            logger.error(f"背景图不存在: {self.bg_path}")
-            return ""
+                                 blur_radius: int = 0, title_color: str = "#000000", text_color: str = "#000000",
+                                 cache: bool = True) -> Union[bytes, str]:
+        return await self._render_cached(
+            "menu", (title, list(lines), blur_radius, title_color, text_color), self._render_menu_image, cache
+        )
+
+    def _render_menu_image(self, title: str, lines: List[str],
+                           blur_radius: int, title_color: str, text_color: str) -> Optional[bytes]:
         try:
-            bg = Image.open(self.bg_path).resize(self.bg_size)
-            if blur_radius > 0:
-                bg = bg.filter(ImageFilter.GaussianBlur(radius=blur_radius))
-            draw = ImageDraw.Draw(bg)
-            title_font = self._load_font(48)
-            text_font = self._load_font(28)
-
-            # 计算标题高度
-            title_bbox = draw.textbbox((0, 0), title, font=title_font)
-            title_height = title_bbox[3] - title_bbox[1]
-
-            # 计算所有内容行的总高度
-            total_height = title_height + 20
-            line_heights = []
-            for line in lines:
-                if line.strip():
-                    bbox = draw.textbbox((0, 0), line, font=text_font)
-                    line_height = bbox[3] - bbox[1]
-                    line_heights.append(line_height)
-                    total_height += line_height + 10
-                else:
-                    line_heights.append(20)
-                    total_height += 20 + 10
-
-            # 计算起始Y坐标（垂直居中）
-            start_y = (self.bg_size[1] - total_height) // 2
-            y = start_y
-
-            # 绘制标题（水平居中）
-            title_bbox = draw.textbbox((0, 0), title, font=title_font)
-            title_w = title_bbox[2] - title_bbox[0]
-            draw.text(((self.bg_size[0] - title_w)/2, y), title, font=title_font, fill=title_color)
-            y += title_height + 20
-
-            # 绘制内容行（水平居中）
-            for i, line in enumerate(lines):
-                if line.strip():
-                    bbox = draw.textbbox((0, 0), line, font=text_font)
-                    text_w = bbox[2] - bbox[0]
-                    x = (self.bg_size[0] - text_w) / 2
-                    draw.text((x, y), line, font=text_font, fill=text_color)
-                y += line_heights[i] + 10
+            bg = get_background(self.bg_path, self.bg_size, blur_radius)
+            layout = menu_layout(self.bg_size, title, lines, self._load_font(48), self._load_font(28))
+            layout.draw(ImageDraw.Draw(bg), title_color, text_color)
 
-            temp_dir = os.path.join(self.data_dir, "temp")
-            os.makedirs(temp_dir, exist_ok=True)
-            out_path = os.path.join(temp_dir, f"menu_{int(time.time())}.png")
-            bg.save(out_path)
-            return out_path
+            return encode_image(bg, self.encoding)
         except Exception as e:
             logger.error(f"生成菜单图片失败: {e}")
-            return ""
\ No newline at end of file
+            return None
\ No newline at end of file
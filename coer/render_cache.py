@@ -0,0 +1,173 @@
+# coer/render_cache.py
+"""
+渲染结果缓存。
+菜单在配置不变时每次都画出完全相同的图片，排行榜在分数变化前也是如此，
+因此按渲染参数的哈希缓存编码后的图片字节：内存中按总字节数做 LRU，
+可选把被挤出内存的条目落盘，重启后仍可命中；相同参数的并发请求只渲染一次。
+"""
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+from astrbot.api import logger
+
+
+def render_key(*parts) -> str:
+    """把渲染参数序列化后取哈希，作为缓存键和落盘文件名"""
+    raw = json.dumps(parts, ensure_ascii=False, default=str, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, spill_dir: Optional[str] = None,
+                 spill_max_bytes: int = 128 * 1024 * 1024):
+        """
+        :param max_bytes: 内存中缓存的图片总字节数上限，0 表示不缓存
+        :param spill_dir: 落盘目录，为空时被挤出的条目直接丢弃
+        :param spill_max_bytes: 落盘目录的总字节数上限，超出时删除最久未写入的文件
+        """
+        self.max_bytes = max(0, max_bytes)
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    async def get_or_render(self, key: str, render: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        """
+        命中则直接返回缓存字节，否则调用 render 渲染并写入缓存。
+        render 返回空值表示渲染失败，失败结果不缓存。
+        """
+        if not self.enabled:
+            return await render()
+
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return data
+
+        task = self._inflight.get(key)
+        if task is None:
+            # 渲染放在独立任务中，发起的请求被取消时不影响合并进来的其他等待者
+            task = asyncio.create_task(self._load_or_render(key, render))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._render_done(key, t))
+        else:
+            self._coalesced += 1
+        return await asyncio.shield(task)
+
+    def _render_done(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # 所有等待者都已取消时没人取结果，在这里取出异常，避免 “exception was never retrieved” 警告
+        if not task.cancelled():
+            task.exception()
+
+    async def _load_or_render(self, key: str, render: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        data = await self._load_spilled(key)
+        if data is not None:
+            self._disk_hits += 1
+        else:
+            self._misses += 1
+            data = await render()
+        if data:
+            await self._put(key, data)
+        return data
+
+    async def _put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            await self._spill({key: data})
+            return
+        self._entries[key] = data
+        self._size += len(data)
+        evicted = {}
+        while self._size > self.max_bytes:
+            old_key, old = self._entries.popitem(last=False)
+            self._size -= len(old)
+            evicted[old_key] = old
+        if evicted:
+            await self._spill(evicted)
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.bin")
+
+    async def _spill(self, entries: Dict[str, bytes]):
+        if not self.spill_dir:
+            return
+        await asyncio.to_thread(self._write_spilled, entries)
+
+    def _write_spilled(self, entries: Dict[str, bytes]):
+        for key, data in entries.items():
+            path = self._spill_path(key)
+            if os.path.exists(path):
+                continue
+            tmp = path + ".tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except OSError as e:
+                logger.warning(f"渲染缓存落盘失败: {e}")
+        self._trim_spilled()
+
+    def _trim_spilled(self):
+        try:
+            files = []
+            for entry in os.scandir(self.spill_dir):
+                if entry.is_file() and entry.name.endswith(".bin"):
+                    st = entry.stat()
+                    files.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.spill_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    async def _load_spilled(self, key: str) -> Optional[bytes]:
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return await asyncio.to_thread(self._read_file, path)
+        except OSError as e:
+            logger.warning(f"读取渲染缓存失败: {e}")
+            return None
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "hits": self._hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+        }
@@ -0,0 +1,31 @@
+# coer/render_pool.py
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class RenderPool:
+    """
+    图片渲染工作池。
+    Pillow 的缩放、绘制和编码都在工作线程中执行，事件循环只等待结果；
+    同时排队和执行的任务数不超过 queue_size，超出时调用方在此等待（背压），
+    避免一波请求把任务无限堆积在线程池队列里。
+    """
+
+    def __init__(self, workers: int = 2, queue_size: int = 16):
+        self.workers = max(1, workers)
+        self.queue_size = max(self.workers, queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="multigroup-render")
+        self._slots = asyncio.Semaphore(self.queue_size)
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """提交一个同步渲染函数并等待其返回值"""
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -33,55 +33,51 @@ class SignManager:
             return False, "签到功能已关闭", 0
 
         now = int(time.time())
-        user = self.db.get_user(group_id, user_id)
-        last = user.get("last_sign_time", 0)
-
         sign_mode = self.config.sign_mode
         if sign_mode == "24小时制":
             interval = self.config.sign_interval * 3600
-            if last > 0 and now - last < interval:
-                next_time = last + interval
-                return False, f"你已签到过了，下次签到时间：{datetime.fromtimestamp(next_time).strftime('%Y-%m-%d %H:%M:%S')}", 0
+            cutoff = now - interval
         else:
-            if last > 0:
-                last_date = datetime.fromtimestamp(last).strftime("%Y-%m-%d")
-                today = datetime.now().strftime("%Y-%m-%d")
-                if last_date == today:
-                    return False, "你今天已经签到过了，明天再来吧~", 0
+            interval = 48 * 3600
+            # 日期制：上次签到早于今天 0 点才可签到
+            today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            cutoff = int(today_start.timestamp()) - 1
 
         if self.config.points_type == "固定值":
             points_gain = self.config.fixed_points
         else:
             points_gain = random.randint(self.config.random_min, self.config.random_max)
 
-        interval = self.config.sign_interval * 3600 if sign_mode == "24小时制" else 48 * 3600
-        continuous = user.get("continuous_days", 0)
-        if last > 0 and now - last < interval * 2:
-            continuous += 1
-        else:
-            continuous = 1
-
         bonus_days = [int(x.strip()) for x in self.config.continuous_bonus.split(",") if x.strip()]
-        bonus_points = 1 if continuous in bonus_days else 0
-        total_gain = points_gain + bonus_points
 
-        new_points = user.get("points", 0) + total_gain
-        self.db.update_user(
+        # 资格检查与积分写入在数据库中一次完成，避免并发签到重复得分
+        user = await self.db.apply_sign(
             group_id,
             user_id,
-            points=new_points,
-            sign_count=user.get("sign_count", 0) + 1,
-            last_sign_time=now,
-            continuous_days=continuous
+            now=now,
+            cutoff=cutoff,
+            streak_window=interval * 2,
+            points_gain=points_gain,
+            bonus_days=bonus_days
         )
+        if user is None:
+            if sign_mode == "24小时制":
+                last = (await self.db.get_user(group_id, user_id)).get("last_sign_time", 0)
+                next_time = last + interval
+                return False, f"你已签到过了，下次签到时间：{datetime.fromtimestamp(next_time).strftime('%Y-%m-%d %H:%M:%S')}", 0
+            return False, "你今天已经签到过了，明天再来吧~", 0
+
+        continuous = user["continuous_days"]
+        bonus_points = 1 if continuous in bonus_days else 0
+        total_gain = points_gain + bonus_points
 
         daily_special = self._get_daily_special()
 
         msg = (
             f"✅ 签到成功！\n"
             f"获得积分：{total_gain}（基础{points_gain}，连续奖励{bonus_points}）\n"
-            f"当前积分：{new_points}\n"
-            f"累计签到：{user.get('sign_count',0)+1}天\n"
+            f"当前积分：{user['points']}\n"
+            f"累计签到：{user['sign_count']}天\n"
             f"连续签到：{continuous}天\n"
             f"{daily_special}"
         )
@@ -0,0 +1,200 @@
+# coer/temp_storage.py
+"""
+临时文件管理。
+data_dir/temp 下的文件分两类：
+- 工作区（ws/<用途>_<随机串>/）：单次请求的下载文件，请求结束时整个目录删除；
+  进程崩溃留下的工作区在下次启动时清掉。
+- 共享输出（temp 根目录）：文件模式下生成的图片等，超过 TTL 后删除。
+另外定期检查总字节数，超过配额时从最旧的文件开始删除（正在使用的工作区除外）。
+"""
+import asyncio
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+from astrbot.api import logger
+
+# 后台清理间隔（秒）及其下限
+TEMP_SWEEP_INTERVAL = 600
+MIN_SWEEP_INTERVAL = 60
+# 共享输出文件保留时间的下限（秒），保证文件模式生成的图片在发送前不会被清掉
+MIN_TEMP_TTL = 300
+WORKSPACE_DIR = "ws"
+
+
+class Workspace:
+    """单次请求的临时目录，close 后整个目录被删除"""
+
+    def __init__(self, storage: "TempStorage", path: Path):
+        self.storage = storage
+        self.path = path
+
+    def close(self):
+        self.storage._release(self.path)
+
+    def __enter__(self) -> "Workspace":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TempStorage:
+    def __init__(self, root, quota_bytes: int = 1024 * 1024 * 1024, ttl: int = 3600):
+        """
+        :param root: 临时目录（通常是 data_dir/temp）
+        :param quota_bytes: 临时目录总字节数上限
+        :param ttl: 共享输出文件的保留秒数，不小于 MIN_TEMP_TTL
+        """
+        self.root = Path(root)
+        self.quota_bytes = quota_bytes
+        self.ttl = max(MIN_TEMP_TTL, ttl)
+        self._active = set()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def output_dir(self) -> str:
+        return str(self.root)
+
+    def open_workspace(self, purpose: str) -> Workspace:
+        path = self.root / WORKSPACE_DIR / f"{purpose}_{uuid.uuid4().hex[:12]}"
+        path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._active.add(path)
+        return Workspace(self, path)
+
+    def _release(self, path: Path):
+        with self._lock:
+            self._active.discard(path)
+        shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def _size_of(path: Path) -> int:
+        try:
+            if path.is_dir():
+                return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+            return path.stat().st_size
+        except OSError:
+            return 0
+
+    def _scan(self) -> Tuple[List[tuple], List[Path], int]:
+        """
+        返回 (可删除文件列表, 闲置工作区列表, 总字节数)。
+        可删除文件为 (mtime, size, path)；正在使用的工作区只计入总量。
+        """
+        files = []
+        idle_workspaces = []
+        total = 0
+        if not self.root.exists():
+            return files, idle_workspaces, total
+        with self._lock:
+            active = set(self._active)
+        for entry in os.scandir(self.root):
+            if entry.is_file():
+                st = entry.stat()
+                files.append((st.st_mtime, st.st_size, Path(entry.path)))
+                total += st.st_size
+        ws_root = self.root / WORKSPACE_DIR
+        if ws_root.exists():
+            for entry in os.scandir(ws_root):
+                path = Path(entry.path)
+                total += self._size_of(path)
+                if path not in active:
+                    idle_workspaces.append(path)
+        return files, idle_workspaces, total
+
+    def sweep(self, startup: bool = False) -> Tuple[int, int]:
+        """
+        清理过期文件和闲置工作区，再按配额从最旧的文件开始删除。
+        :param startup: 启动时调用，此时所有工作区都是上次运行遗留的
+        :return: (删除的文件/目录数, 释放的字节数)
+        """
+        removed = 0
+        freed = 0
+        files, idle_workspaces, total = self._scan()
+        now = time.time()
+
+        for path in idle_workspaces:
+            # 运行中的闲置工作区一般来自未关闭的请求，给一个 TTL 的宽限
+            if not startup:
+                try:
+                    if now - path.stat().st_mtime < self.ttl:
+                        continue
+                except OSError:
+                    continue
+            size = self._size_of(path)
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+            removed += 1
+            freed += size
+            total -= size
+
+        remaining = []
+        for mtime, size, path in sorted(files):
+            in_progress = path.name.endswith(".tmp")
+            # 运行中的 .tmp 可能是 write_output 正在写、还没 os.replace 的文件，与其他文件一样按 TTL 处理；
+            # 启动时的 .tmp 都是上次运行中断留下的，直接删除
+            if now - mtime >= self.ttl or (startup and in_progress):
+                try:
+                    path.unlink(missing_ok=True)
+                    removed += 1
+                    freed += size
+                    total -= size
+                except OSError as e:
+                    logger.warning(f"删除临时文件失败: {path}（{e}）")
+            elif not in_progress:
+                remaining.append((mtime, size, path))
+
+        for mtime, size, path in remaining:
+            if total <= self.quota_bytes:
+                break
+            try:
+                path.unlink(missing_ok=True)
+                removed += 1
+                freed += size
+                total -= size
+            except OSError as e:
+                logger.warning(f"删除临时文件失败: {path}（{e}）")
+        if total > self.quota_bytes:
+            logger.warning(f"临时目录占用 {total // 1024 // 1024}MB，超出配额，剩余文件均在使用中")
+        return removed, freed
+
+    def usage(self) -> dict:
+        files, idle_workspaces, total = self._scan()
+        with self._lock:
+            active = len(self._active)
+        return {
+            "files": len(files),
+            "bytes": total,
+            "active_workspaces": active,
+            "idle_workspaces": len(idle_workspaces),
+            "quota_bytes": self.quota_bytes,
+            "ttl": self.ttl,
+        }
+
+    def start_sweeper(self, interval: float = TEMP_SWEEP_INTERVAL):
+        """启动时清理一次上次运行遗留的文件，之后按间隔（不小于 MIN_SWEEP_INTERVAL）定期清理"""
+        self._task = asyncio.create_task(self._sweep_loop(max(MIN_SWEEP_INTERVAL, interval)))
+
+    async def _sweep_loop(self, interval: float):
+        startup = True
+        while True:
+            try:
+                removed, freed = await asyncio.to_thread(self.sweep, startup)
+                if removed:
+                    logger.info(f"已清理 {removed} 个临时文件，释放 {freed // 1024}KB")
+            except Exception as e:
+                logger.error(f"清理临时文件失败: {e}")
+            startup = False
+            await asyncio.sleep(interval)
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
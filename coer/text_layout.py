@@ -0,0 +1,135 @@
+# coer/text_layout.py
+"""
+文字排版缓存。
+排行榜和菜单的每一行原先都要 textbbox 两次（先算总高度，绘制时再量一次宽度），
+而菜单内容基本固定，每次请求都在重复测量同样的文字。
+这里按 (字体, 文字) 缓存测量结果，并把整张图的排版（每行坐标和总高度）
+缓存为 TextLayout 对象，绘制时只需按排好的坐标逐行 draw.text。
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+# 测量结果缓存条数（(字体, 文字) 组合）
+MEASURE_CACHE_SIZE = 4096
+# 整图排版缓存条数
+LAYOUT_CACHE_SIZE = 256
+
+_measure_cache: "OrderedDict[tuple, Tuple[int, int, int, int]]" = OrderedDict()
+_measure_lock = threading.Lock()
+_layout_cache: "OrderedDict[tuple, TextLayout]" = OrderedDict()
+_layout_lock = threading.Lock()
+
+
+def measure(font, text: str) -> Tuple[int, int, int, int]:
+    """返回文字在 (0, 0) 处的包围盒，与 draw.textbbox((0, 0), text, font=font) 一致"""
+    # 字体对象由 image_assets.get_font 统一缓存，按对象本身作键即可
+    key = (font, text)
+    with _measure_lock:
+        bbox = _measure_cache.get(key)
+        if bbox is not None:
+            _measure_cache.move_to_end(key)
+            return bbox
+    bbox = font.getbbox(text)
+    with _measure_lock:
+        _measure_cache[key] = bbox
+        while len(_measure_cache) > MEASURE_CACHE_SIZE:
+            _measure_cache.popitem(last=False)
+    return bbox
+
+
+@dataclass(frozen=True)
+class TextItem:
+    x: float
+    y: float
+    text: str
+    font: object
+    # 是否使用标题颜色
+    is_title: bool = False
+
+
+@dataclass(frozen=True)
+class TextLayout:
+    """排好版的一整张图：每行的坐标、字体，以及内容总高度"""
+    items: Tuple[TextItem, ...]
+    height: int
+
+    def draw(self, draw, title_color: str, text_color: str):
+        for item in self.items:
+            draw.text((item.x, item.y), item.text, font=item.font,
+                      fill=title_color if item.is_title else text_color)
+
+
+def _cached_layout(key: tuple, build) -> TextLayout:
+    with _layout_lock:
+        layout = _layout_cache.get(key)
+        if layout is not None:
+            _layout_cache.move_to_end(key)
+            return layout
+    layout = build()
+    with _layout_lock:
+        _layout_cache[key] = layout
+        while len(_layout_cache) > LAYOUT_CACHE_SIZE:
+            _layout_cache.popitem(last=False)
+    return layout
+
+
+def rank_layout(canvas: Tuple[int, int], title: str, lines: Sequence[str], max_lines: int,
+                title_font, text_font) -> TextLayout:
+    """排行榜：标题水平居中，内容左对齐，整体垂直居中；超出 max_lines 时追加人数提示"""
+    def build() -> TextLayout:
+        title_bbox = measure(title_font, title)
+        title_height = title_bbox[3] - title_bbox[1]
+        rows: List[str] = list(lines[:max_lines])
+        if len(lines) > max_lines:
+            rows.append(f"... 共{len(lines)}人")
+        heights = []
+        for row in rows:
+            bbox = measure(text_font, row)
+            heights.append(bbox[3] - bbox[1])
+        total_height = title_height + 20 + sum(h + 10 for h in heights)
+
+        y = (canvas[1] - total_height) // 2
+        items = [TextItem((canvas[0] - (title_bbox[2] - title_bbox[0])) / 2, y, title, title_font, True)]
+        y += title_height + 20
+        for row, h in zip(rows, heights):
+            items.append(TextItem(100, y, row, text_font))
+            y += h + 10
+        return TextLayout(tuple(items), total_height)
+
+    key = ("rank", canvas, title, tuple(lines), max_lines, title_font, text_font)
+    return _cached_layout(key, build)
+
+
+def menu_layout(canvas: Tuple[int, int], title: str, lines: Sequence[str],
+                title_font, text_font) -> TextLayout:
+    """菜单：标题和每行都水平居中，空行占 20 像素，整体垂直居中"""
+    def build() -> TextLayout:
+        title_bbox = measure(title_font, title)
+        title_height = title_bbox[3] - title_bbox[1]
+        total_height = title_height + 20
+        rows = []
+        for line in lines:
+            if line.strip():
+                bbox = measure(text_font, line)
+                rows.append((line, bbox[2] - bbox[0], bbox[3] - bbox[1]))
+            else:
+                rows.append((None, 0, 20))
+            total_height += rows[-1][2] + 10
+
+        y = (canvas[1] - total_height) // 2
+        items = [TextItem((canvas[0] - (title_bbox[2] - title_bbox[0])) / 2, y, title, title_font, True)]
+        y += title_height + 20
+        for text, width, h in rows:
+            if text is not None:
+                items.append(TextItem((canvas[0] - width) / 2, y, text, text_font))
+            y += h + 10
+        return TextLayout(tuple(items), total_height)
+
+    key = ("menu", canvas, title, tuple(lines), title_font, text_font)
+    return _cached_layout(key, build)
+
+
+def layout_cache_stats() -> dict:
+    return {"measures": len(_measure_cache), "layouts": len(_layout_cache)}
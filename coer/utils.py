@@ -2,7 +2,8 @@
 import re
 import time
 import random
-from typing import List, Optional, Tuple
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 import aiohttp
@@ -10,6 +11,11 @@ from astrbot.api import logger
 from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import AiocqhttpMessageEvent
 from astrbot.core.message.components import At, Reply, Image
 
+# 单次群成员信息查询的超时（秒），超时后直接显示QQ号
+NICKNAME_TIMEOUT = 3.0
+# 批量查询昵称时同时进行的请求数
+NICKNAME_CONCURRENCY = 8
+
 def get_ats(event: AiocqhttpMessageEvent) -> List[str]:
     ats = []
     try:
@@ -41,19 +47,51 @@ def get_reply_text(event: AiocqhttpMessageEvent) -> str:
         pass
     return ""
 
-async def get_nickname(event: AiocqhttpMessageEvent, user_id: str) -> str:
+async def get_nickname(event: AiocqhttpMessageEvent, user_id: str, timeout: float = NICKNAME_TIMEOUT) -> str:
     try:
-        info = await event.bot.get_group_member_info(
+        info = await asyncio.wait_for(event.bot.get_group_member_info(
             group_id=int(event.get_group_id()),
             user_id=int(user_id),
             no_cache=True
-        )
+        ), timeout)
         card = info.get("card", "").strip()
         nickname = info.get("nickname", "").strip()
         return card or nickname or user_id
     except:
         return user_id
 
+async def get_nicknames(event: AiocqhttpMessageEvent, user_ids: Iterable[str],
+                        concurrency: int = NICKNAME_CONCURRENCY, timeout: float = NICKNAME_TIMEOUT) -> Dict[str, str]:
+    """
+    并发查询多个成员的昵称，同时进行的请求不超过 concurrency 个。
+    单个查询失败或超时时该成员显示为QQ号，不影响其他成员。
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def resolve(uid: str) -> str:
+        async with semaphore:
+            return await get_nickname(event, uid, timeout)
+
+    names = await asyncio.gather(*[resolve(uid) for uid in user_ids])
+    return dict(zip(user_ids, names))
+
+async def timed_step(timings: Dict[str, float], name: str, awaitable, timeout: float, fallback=None):
+    """
+    带超时地等待一个步骤，并把耗时（毫秒）记入 timings。
+    超时或出错时返回 fallback，不影响同时进行的其他步骤。
+    """
+    start = time.perf_counter()
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"{name} 超时（{timeout}秒），使用默认值")
+    except Exception as e:
+        logger.warning(f"{name} 失败，使用默认值: {e}")
+    finally:
+        timings[name] = (time.perf_counter() - start) * 1000
+    return fallback
+
 async def download_file(url: str, save_path: Path, headers: dict = None) -> Optional[Path]:
     """
     下载文件，支持自定义 headers，并添加更完整的浏览器请求头以绕过防盗链
@@ -31,15 +31,23 @@ except ImportError:
         logger.warning("MessageChain 导入失败，合并转发可能无法使用")
 
 from coer.config import PluginConfig
-from coer.data_manager import Database
+from coer.data_manager import Database, AsyncDatabase, DEFAULT_USER
 from coer.sign_manager import SignManager
 from coer.rank_manager import RankImageGenerator
+from coer.image_assets import EncodeOptions
 from coer.profile_generator import ProfileImageGenerator
+from coer.avatar_cache import AvatarCache
+from coer.quote_service import QuoteService, DEFAULT_QUOTE
+from coer.render_pool import RenderPool
+from coer.render_cache import RenderCache
+from coer.temp_storage import TempStorage, TEMP_SWEEP_INTERVAL
+from coer.text_layout import layout_cache_stats
 from coer.anti_spam import AntiSpam
+from coer.member_directory import MemberDirectory
 from coer.video_parser import parse_video as video_parser_func
 from coer.utils import (
-    get_ats, get_reply_text, parse_bool, get_nickname, download_file,
-    extract_target_ids, get_reply_message_id
+    get_ats, get_reply_text, parse_bool, download_file,
+    extract_target_ids, get_reply_message_id, timed_step
 )
 from coer.curfew import CurfewHandle
 
@@ -114,9 +122,32 @@ ADMIN_CATEGORIES = [
             {"cmd": "开启宵禁", "desc": "开启宵禁 [HH:MM HH:MM]（留空使用默认时间）"},
             {"cmd": "关闭宵禁", "desc": "关闭本群宵禁"}
         ]
+    },
+    {
+        "name": "数据迁移",
+        "key": "数据",
+        "items": [
+            {"cmd": "导出数据", "desc": "导出本群积分/签到/禁言数据（JSONL 文件）"},
+            {"cmd": "导入数据", "desc": "导入数据 <文件名> [覆盖/累加/跳过]（文件放在数据目录 transfer 下）"}
+        ]
+    },
+    {
+        "name": "系统维护",
+        "key": "维护",
+        "items": [
+            {"cmd": "临时文件", "desc": "查看临时文件占用"},
+            {"cmd": "清理临时文件", "desc": "立即清理过期和超出配额的临时文件"},
+            {"cmd": "缓存状态", "desc": "查看用户数据、图片、排版、头像、一言缓存的命中情况"}
+        ]
     }
 ]
 
+# 导入数据时 users 冲突策略的中文名
+IMPORT_POLICY_NAMES = {"覆盖": "overwrite", "累加": "add", "跳过": "skip"}
+
+# 个人信息各步骤的超时（秒），超时的步骤使用默认值，其余步骤照常完成
+PROFILE_STEP_TIMEOUTS = {"history": 3.0, "db": 5.0, "nickname": 4.0, "avatar": 6.0, "quote": 2.0}
+
 @register(
     name="astrbot_plugin_multigroup",
     author="感情",
@@ -137,23 +168,85 @@ class MultiGroupPlugin(Star):
 
         self.plugin_config = PluginConfig.from_dict(self.config_dict, self.plugin_dir, self.data_dir)
 
-        self.db = Database(self.data_dir / "multigroup.db")
+        # 所有数据库访问都经由专用线程执行，避免阻塞事件循环
+        self.db = AsyncDatabase(Database(
+            self.data_dir / "multigroup.db",
+            write_behind=self.plugin_config.write_behind,
+            batch_size=self.plugin_config.write_behind_batch,
+            user_cache_size=self.plugin_config.user_cache_size
+        ))
+        if self.plugin_config.write_behind:
+            self.db.start_flush_loop(self.plugin_config.write_behind_interval)
+        if self.plugin_config.mute_retention_days > 0:
+            self.db.start_mute_retention(
+                self.plugin_config.mute_retention_days,
+                self.plugin_config.mute_prune_batch,
+                self.data_dir / "mutes_archive.db" if self.plugin_config.mute_archive else None
+            )
+
+        # 临时文件统一放在 data_dir/temp，启动时先清掉上次遗留的文件
+        self.temp_storage = TempStorage(
+            self.data_dir / "temp",
+            self.plugin_config.temp_quota_mb * 1024 * 1024,
+            self.plugin_config.temp_ttl_minutes * 60
+        )
+        self.temp_storage.start_sweeper(min(TEMP_SWEEP_INTERVAL, self.temp_storage.ttl))
 
         self.sign_mgr = SignManager(self.db, self.plugin_config)
+        self.render_pool = RenderPool(
+            self.plugin_config.render_workers,
+            self.plugin_config.render_queue_size
+        )
+        self.image_output = "file" if self.plugin_config.image_delivery == "文件" else "bytes"
+        self.image_encoding = EncodeOptions.from_config(
+            self.plugin_config.image_format,
+            self.plugin_config.image_quality,
+            self.plugin_config.image_scale
+        )
+        self.render_cache = RenderCache(
+            self.plugin_config.render_cache_mb * 1024 * 1024,
+            str(self.data_dir / "render_cache") if self.plugin_config.render_cache_spill else None
+        )
         self.rank_gen = RankImageGenerator(
             str(self.plugin_dir),
             str(self.data_dir),
             self.plugin_config.background_image,
-            self.plugin_config.font_file
+            self.plugin_config.font_file,
+            self.render_pool,
+            self.render_cache,
+            self.image_output,
+            self.temp_storage,
+            self.image_encoding
         )
+        self.avatar_cache = AvatarCache(
+            self.data_dir / "avatar_cache",
+            self.plugin_config.avatar_memory_items,
+            self.plugin_config.avatar_disk_mb * 1024 * 1024,
+            self.plugin_config.avatar_refresh_hours * 3600
+        )
+        self.quote_service = QuoteService(
+            self.plugin_config,
+            self.plugin_config.quote_pool_size,
+            self.plugin_config.quote_timeout,
+            self.plugin_config.quote_mode == "每群每天"
+        )
+        self.quote_service.start()
         self.profile_gen = ProfileImageGenerator(
             str(self.plugin_dir),
             str(self.data_dir),
             self.plugin_config.background_image,
             self.plugin_config.font_file,
-            self.plugin_config.profile_blur_radius
+            self.plugin_config.profile_blur_radius,
+            self.render_pool,
+            self.image_output,
+            self.temp_storage,
+            self.image_encoding,
+            self.avatar_cache,
+            self.quote_service
         )
-        self.anti_spam = AntiSpam(self.db, self.plugin_config)
+        # 群成员目录：昵称显示和 @昵称 解析都走本地缓存
+        self.members = MemberDirectory(self.plugin_config.member_cache_ttl)
+        self.anti_spam = AntiSpam(self.db, self.plugin_config, self.members)
 
         self.curfew = CurfewHandle(self.context, self.plugin_config)
         self.ban_me_quotes = self.plugin_config.ban_me_quotes
@@ -186,7 +279,18 @@ class MultiGroupPlugin(Star):
         args = parts[1] if len(parts) > 1 else ""
         return cmd, args
 
-    async def send_by_style(self, event: AstrMessageEvent, style: str, text: str, title: str = ""):
+    def image_result(self, event: AstrMessageEvent, img: Union[bytes, str]):
+        """生成器返回的是图片数据时直接以 base64 发送，不落盘；返回路径时按文件发送"""
+        if isinstance(img, bytes):
+            return event.chain_result([Image.fromBytes(img)])
+        return event.image_result(img)
+
+    async def send_by_style(self, event: AstrMessageEvent, style: str, text: str, title: str = "",
+                            cache: bool = False):
+        """
+        :param cache: 是否复用渲染缓存；只有菜单这类内容固定的图片传 True，
+                      签到结果等每次都不同的图片不进缓存
+        """
         if style == "图片":
             lines = text.split("\n")
             if title.startswith("📋") or title.startswith("⚙️") or title.startswith("📂"):
@@ -194,24 +298,27 @@ class MultiGroupPlugin(Star):
                     title, lines,
                     blur_radius=self.plugin_config.menu_blur_radius,
                     title_color=self.plugin_config.title_color,
-                    text_color=self.plugin_config.text_color
+                    text_color=self.plugin_config.text_color,
+                    cache=cache
                 )
             elif "排行榜" in title:
                 img_path = await self.rank_gen.create_rank_image(
                     title, lines, self.plugin_config.rank_max_lines,
                     blur_radius=self.plugin_config.rank_blur_radius,
                     title_color=self.plugin_config.title_color,
-                    text_color=self.plugin_config.text_color
+                    text_color=self.plugin_config.text_color,
+                    cache=cache
                 )
             else:
                 img_path = await self.rank_gen.create_menu_image(
                     title, lines,
                     blur_radius=self.plugin_config.menu_blur_radius,
                     title_color=self.plugin_config.title_color,
-                    text_color=self.plugin_config.text_color
+                    text_color=self.plugin_config.text_color,
+                    cache=cache
                 )
             if img_path:
-                await event.send(event.image_result(img_path))
+                await event.send(self.image_result(event, img_path))
                 return
         await event.send(event.plain_result(text))
 
@@ -222,6 +329,12 @@ class MultiGroupPlugin(Star):
         if not self.is_group_allowed(group_id):
             return
 
+        raw = getattr(event.message_obj, "raw_message", None)
+        if isinstance(raw, dict) and raw.get("post_type") == "notice":
+            # 进群/退群/改名片通知只用于更新成员目录
+            self.members.handle_notice(raw)
+            return
+
         text = event.message_str.strip()
         cmd, args = self.get_cmd(text)
 
@@ -295,6 +408,16 @@ class MultiGroupPlugin(Star):
                 await self.handle_start_curfew(event, args)
             elif cmd == "关闭宵禁" and self.plugin_config.enable_curfew:
                 await self.handle_stop_curfew(event)
+            elif cmd == "导出数据":
+                await self.handle_export_data(event)
+            elif cmd == "导入数据":
+                await self.handle_import_data(event, args)
+            elif cmd == "临时文件":
+                await self.handle_temp_usage(event)
+            elif cmd == "清理临时文件":
+                await self.handle_temp_sweep(event)
+            elif cmd == "缓存状态":
+                await self.handle_cache_stats(event)
 
     # ==================== 菜单显示（优化居中对齐） ====================
     async def show_user_menu(self, event: AiocqhttpMessageEvent):
@@ -352,7 +475,7 @@ class MultiGroupPlugin(Star):
             lines.append(separator)
         
         text = "\n".join(lines)
-        await self.send_by_style(event, self.plugin_config.menu_style, text, "用户菜单")
+        await self.send_by_style(event, self.plugin_config.menu_style, text, "用户菜单", cache=True)
 
     async def show_admin_menu(self, event: AiocqhttpMessageEvent):
         title = "⚙️ 管理员菜单"
@@ -405,7 +528,7 @@ class MultiGroupPlugin(Star):
             lines.append(separator)
         
         text = "\n".join(lines)
-        await self.send_by_style(event, self.plugin_config.menu_style, text, "管理员菜单")
+        await self.send_by_style(event, self.plugin_config.menu_style, text, "管理员菜单", cache=True)
 
     async def show_category_items(self, event: AiocqhttpMessageEvent, category: dict):
         lines = [f"【{category['name']}】", ""]
@@ -415,44 +538,63 @@ class MultiGroupPlugin(Star):
             lines.append("该分类下暂无功能。")
         title = f"{category['name']}"
         style = self.plugin_config.menu_style
-        await self.send_by_style(event, style, "\n".join(lines), title)
+        await self.send_by_style(event, style, "\n".join(lines), title, cache=True)
 
     # ==================== 个人功能（已移除购买记录和使用榜） ====================
     async def handle_profile(self, event: AiocqhttpMessageEvent):
+        timings: Dict[str, float] = {}
         target_id = None
         first_seg = event.get_messages()[0] if event.get_messages() else None
         if isinstance(first_seg, Reply):
             try:
-                reply_msg_id = first_seg.id
                 payload = {
                     "group_id": int(event.get_group_id()),
-                    "message_seq": int(reply_msg_id),
+                    "message_seq": int(first_seg.id),
                     "count": 1,
                     "reverseOrder": False
                 }
-                result = await event.bot.api.call_action("get_group_msg_history", **payload)
-                if result.get("messages"):
+                result = await timed_step(
+                    timings, "引用消息", event.bot.api.call_action("get_group_msg_history", **payload),
+                    PROFILE_STEP_TIMEOUTS["history"]
+                )
+                if result and result.get("messages"):
                     target_id = str(result["messages"][0]["sender"]["user_id"])
             except:
                 pass
         if not target_id:
             target_id = event.get_sender_id()
         group_id = event.get_group_id()
-        user = self.db.get_user(group_id, target_id)
-        # 不再获取购买记录
-        points_rank_data = self.db.get_points_rank(group_id, 1000)
-        sign_rank_data = self.db.get_sign_rank(group_id, 1000)
-        def get_rank(data, uid):
-            for i, (user_id, _) in enumerate(data, 1):
-                if user_id == uid:
-                    return i
-            return None
+        image_style = self.plugin_config.profile_style == "图片"
+
+        # 各项数据互不依赖，同时获取；总耗时约等于最慢的一步，单步超时只影响该项的显示
+        steps = [
+            timed_step(timings, "用户数据", self.db.get_user(group_id, target_id),
+                       PROFILE_STEP_TIMEOUTS["db"], dict(DEFAULT_USER)),
+            timed_step(timings, "积分排名", self.db.get_user_rank(group_id, target_id, "points"),
+                       PROFILE_STEP_TIMEOUTS["db"], {"rank": "未知"}),
+            timed_step(timings, "签到排名", self.db.get_user_rank(group_id, target_id, "sign_count"),
+                       PROFILE_STEP_TIMEOUTS["db"], {"rank": "未知"}),
+            timed_step(timings, "昵称", self.members.nickname(event, target_id),
+                       PROFILE_STEP_TIMEOUTS["nickname"], target_id) if group_id else asyncio.sleep(0, target_id),
+        ]
+        if image_style:
+            steps += [
+                timed_step(timings, "一言", self.profile_gen.fetch_quote(self.plugin_config, group_id),
+                           PROFILE_STEP_TIMEOUTS["quote"], DEFAULT_QUOTE),
+                # 头像下载超时不会被取消，后台下完后写入缓存，下次直接命中
+                timed_step(timings, "头像", self.profile_gen.fetch_avatar(target_id),
+                           PROFILE_STEP_TIMEOUTS["avatar"]),
+            ]
+        start = time.perf_counter()
+        user, points_rank, sign_rank, nickname, *assets = await asyncio.gather(*steps)
+        timings["数据汇总"] = (time.perf_counter() - start) * 1000
+        # 没有数据的用户不参与排名
         rank_info = {
-            "points_rank": get_rank(points_rank_data, target_id) or "未上榜",
-            "sign_rank": get_rank(sign_rank_data, target_id) or "未上榜",
+            "points_rank": points_rank["rank"] or "未上榜",
+            "sign_rank": sign_rank["rank"] or "未上榜",
         }
-        nickname = await get_nickname(event, target_id) if event.get_group_id() else target_id
-        if self.plugin_config.profile_style == "图片":
+        if image_style:
+            start = time.perf_counter()
             img_path = await self.profile_gen.create_profile_image(
                 target_id,
                 nickname,
@@ -460,16 +602,27 @@ class MultiGroupPlugin(Star):
                 user["sign_count"],
                 [],  # 商品列表为空
                 rank_info,
-                self.plugin_config
+                self.plugin_config,
+                group_id,
+                assets=tuple(assets)
             )
+            timings["渲染"] = (time.perf_counter() - start) * 1000
+            self._log_profile_timings(target_id, timings)
             if img_path:
-                await event.send(event.image_result(img_path))
+                await event.send(self.image_result(event, img_path))
                 return
+        else:
+            self._log_profile_timings(target_id, timings)
         msg = f"【个人信息】\n昵称：{nickname}\nQQ：{target_id}\n积分：{user['points']}\n签到次数：{user['sign_count']}\n"
         msg += f"\n积分排名：{rank_info['points_rank']}\n签到排名：{rank_info['sign_rank']}"
         await event.send(event.plain_result(msg))
         event.stop_event()
 
+    @staticmethod
+    def _log_profile_timings(target_id: str, timings: Dict[str, float]):
+        detail = "，".join(f"{name} {ms:.0f}ms" for name, ms in timings.items())
+        logger.debug(f"[个人信息] {target_id} 各步骤耗时：{detail}")
+
     async def handle_sign(self, event: AiocqhttpMessageEvent):
         user_id = event.get_sender_id()
         group_id = event.get_group_id()
@@ -484,17 +637,18 @@ class MultiGroupPlugin(Star):
     async def handle_points(self, event: AiocqhttpMessageEvent):
         user_id = event.get_sender_id()
         group_id = event.get_group_id()
-        user = self.db.get_user(group_id, user_id)
+        user = await self.db.get_user(group_id, user_id)
         await event.send(event.plain_result(f"你的积分：{user['points']}"))
         event.stop_event()
 
     async def handle_points_rank(self, event: AiocqhttpMessageEvent):
         group_id = event.get_group_id()
-        data = self.db.get_points_rank(group_id, self.plugin_config.rank_max_lines)
+        data = await self.db.get_points_rank(group_id, self.plugin_config.rank_max_lines)
+        # 所有昵称并发查询，榜单耗时约等于最慢的一次查询而不是逐个累加
+        names = await self.members.nicknames(event, [uid for uid, _ in data]) if event.get_group_id() else {}
         lines = []
         for i, (uid, points) in enumerate(data, 1):
-            nickname = await get_nickname(event, uid) if event.get_group_id() else uid
-            lines.append(f"{i}. {nickname} - {points}积分")
+            lines.append(f"{i}. {names.get(uid, uid)} - {points}积分")
         title = self.plugin_config.points_rank_title
         style = self.plugin_config.rank_style
         if style == "图片":
@@ -505,7 +659,7 @@ class MultiGroupPlugin(Star):
                 text_color=self.plugin_config.text_color
             )
             if img:
-                await event.send(event.image_result(img))
+                await event.send(self.image_result(event, img))
                 event.stop_event()
                 return
         await event.send(event.plain_result("\n".join([title] + lines)))
@@ -513,11 +667,12 @@ class MultiGroupPlugin(Star):
 
     async def handle_sign_rank(self, event: AiocqhttpMessageEvent):
         group_id = event.get_group_id()
-        data = self.db.get_sign_rank(group_id, self.plugin_config.rank_max_lines)
+        data = await self.db.get_sign_rank(group_id, self.plugin_config.rank_max_lines)
+        # 所有昵称并发查询，榜单耗时约等于最慢的一次查询而不是逐个累加
+        names = await self.members.nicknames(event, [uid for uid, _ in data]) if event.get_group_id() else {}
         lines = []
         for i, (uid, cnt) in enumerate(data, 1):
-            nickname = await get_nickname(event, uid) if event.get_group_id() else uid
-            lines.append(f"{i}. {nickname} - {cnt}天")
+            lines.append(f"{i}. {names.get(uid, uid)} - {cnt}天")
         title = self.plugin_config.sign_rank_title
         style = self.plugin_config.rank_style
         if style == "图片":
@@ -528,7 +683,7 @@ class MultiGroupPlugin(Star):
                 text_color=self.plugin_config.text_color
             )
             if img:
-                await event.send(event.image_result(img))
+                await event.send(self.image_result(event, img))
                 event.stop_event()
                 return
         await event.send(event.plain_result("\n".join([title] + lines)))
@@ -690,9 +845,9 @@ class MultiGroupPlugin(Star):
             'pipixia': '皮皮虾'
         }.get(platform, platform)
 
-        temp_dir = self.data_dir / "temp"
-        temp_dir.mkdir(exist_ok=True)
-        downloaded_files = []
+        # 本次解析的下载文件都放在独立工作区，结束时整体删除；进程中途退出则由启动清理回收
+        workspace = self.temp_storage.open_workspace("parse")
+        temp_dir = workspace.path
         self_uin = event.get_self_id()
 
         # 获取作者信息（兼容不同字段名）
@@ -729,7 +884,6 @@ class MultiGroupPlugin(Star):
                         # 使用带进度的下载函数
                         downloaded = await self.download_with_progress(cover, cover_file, headers)
                         if downloaded:
-                            downloaded_files.append(cover_file)
                             image_segment = [{
                                 "type": "image",
                                 "data": {"file": str(cover_file)}
@@ -767,7 +921,6 @@ class MultiGroupPlugin(Star):
                             img_file = temp_dir / f"image_{int(time.time())}_{idx}_{random.randint(1000,9999)}{ext}"
                             downloaded = await self.download_with_progress(img_url, img_file, headers)
                             if downloaded:
-                                downloaded_files.append(img_file)
                                 image_segment = [{
                                     "type": "image",
                                     "data": {"file": str(img_file)}
@@ -805,7 +958,6 @@ class MultiGroupPlugin(Star):
                         cover_file = temp_dir / f"cover_{int(time.time())}_{random.randint(1000,9999)}.jpg"
                         downloaded = await self.download_with_progress(cover, cover_file, headers)
                         if downloaded:
-                            downloaded_files.append(cover_file)
                             image_segment = [{
                                 "type": "image",
                                 "data": {"file": str(cover_file)}
@@ -862,12 +1014,9 @@ class MultiGroupPlugin(Star):
                                 if zip_size > 100 * 1024 * 1024:  # 压缩后仍大于100MB，放弃发送文件
                                     await event.send(event.plain_result("压缩后文件仍过大，无法发送，请直接访问链接下载"))
                                     forward_messages.append((self_uin, author_name, f"视频下载链接：{video_url}"))
-                                    # 清理ZIP文件（原视频稍后统一清理）
+                                    # 清理ZIP文件（原视频随工作区一起清理）
                                     zip_file.unlink(missing_ok=True)
                                 else:
-                                    # 将原视频和ZIP文件都加入清理列表
-                                    downloaded_files.append(video_file)
-                                    downloaded_files.append(zip_file)
                                     # 在转发消息中添加ZIP文件节点
                                     zip_segment = [{
                                         "type": "file",
@@ -879,7 +1028,6 @@ class MultiGroupPlugin(Star):
                             except Exception as e:
                                 logger.error(f"压缩视频失败: {e}")
                                 # 压缩失败，尝试发送原视频文件
-                                downloaded_files.append(video_file)
                                 video_segment = [{
                                     "type": "video",
                                     "data": {"file": str(video_file)}
@@ -889,7 +1037,6 @@ class MultiGroupPlugin(Star):
                                 forward_messages.append((self_uin, author_name, f"视频链接（备用）：{video_url}"))
                         else:
                             # 小于50MB，直接发送视频
-                            downloaded_files.append(video_file)
                             video_segment = [{
                                 "type": "video",
                                 "data": {"file": str(video_file)}
@@ -972,12 +1119,10 @@ class MultiGroupPlugin(Star):
             logger.error(f"[解析] 处理异常: {e}")
             await event.send(event.plain_result(f"处理失败：{str(e)}"))
         finally:
-            for f in downloaded_files:
-                try:
-                    if f.exists():
-                        f.unlink(missing_ok=True)
-                except Exception as e:
-                    logger.error(f"[解析] 清理文件失败: {e}")
+            try:
+                workspace.close()
+            except Exception as e:
+                logger.error(f"[解析] 清理工作区失败: {e}")
         event.stop_event()
 
     # ==================== 昵称解析辅助方法 ====================
@@ -987,19 +1132,7 @@ class MultiGroupPlugin(Star):
         优先匹配群名片(card)，再匹配昵称(nickname)。
         如果找到唯一匹配，返回QQ号；如果找到多个，返回None并发送提示。
         """
-        try:
-            members = await event.bot.get_group_member_list(group_id=int(event.get_group_id()))
-        except Exception as e:
-            logger.error(f"获取群成员列表失败: {e}")
-            return None
-
-        matched = []
-        for member in members:
-            # 获取群名片，如果没有则用昵称
-            display_name = member.get('card') or member.get('nickname') or ''
-            if display_name == nickname:
-                matched.append(str(member['user_id']))
-
+        matched = await self.members.find_by_name(event, nickname)
         if not matched:
             return None
         elif len(matched) == 1:
@@ -1062,7 +1195,7 @@ class MultiGroupPlugin(Star):
         for uid in target_ids:
             try:
                 await event.bot.set_group_ban(group_id=group_id, user_id=int(uid), duration=duration)
-                self.db.add_mute_record(uid, event.get_group_id(), "admin", f"管理员禁言 {duration}秒", duration, int(time.time()), int(time.time()) + duration)
+                await self.db.add_mute_record(uid, event.get_group_id(), "admin", f"管理员禁言 {duration}秒", duration, int(time.time()), int(time.time()) + duration)
                 results.append(f"✅ {uid} 已禁言 {duration}秒")
             except Exception as e:
                 results.append(f"❌ {uid} 禁言失败: {e}")
@@ -1277,6 +1410,99 @@ class MultiGroupPlugin(Star):
         await self.curfew.stop_curfew(event)
         event.stop_event()
 
+    # ==================== 群数据迁移 ====================
+    async def handle_export_data(self, event: AiocqhttpMessageEvent):
+        group_id = event.get_group_id()
+        transfer_dir = self.data_dir / "transfer"
+        transfer_dir.mkdir(exist_ok=True)
+        out_path = transfer_dir / f"group_{group_id}_{int(time.time())}.jsonl"
+        try:
+            counts = await self.db.export_group(group_id, out_path)
+        except Exception as e:
+            logger.error(f"导出群数据失败: {e}")
+            await event.send(event.plain_result(f"导出失败：{e}"))
+            event.stop_event()
+            return
+        await event.send(event.plain_result(
+            f"导出完成：用户 {counts['users']} 条，禁言记录 {counts['mutes']} 条，购买记录 {counts['purchases']} 条\n"
+            f"文件：{out_path.name}"
+        ))
+        try:
+            await event.send(event.chain_result([File(name=out_path.name, file=str(out_path))]))
+        except Exception as e:
+            logger.error(f"发送导出文件失败: {e}")
+        event.stop_event()
+
+    async def handle_import_data(self, event: AiocqhttpMessageEvent, args: str):
+        parts = args.split()
+        if not parts:
+            await event.send(event.plain_result("用法：导入数据 <文件名> [覆盖/累加/跳过]，文件需放在插件数据目录的 transfer 文件夹中"))
+            event.stop_event()
+            return
+        # 只取文件名，防止跳出 transfer 目录
+        in_path = self.data_dir / "transfer" / Path(parts[0]).name
+        policy_name = parts[1] if len(parts) > 1 else "覆盖"
+        if policy_name not in IMPORT_POLICY_NAMES:
+            await event.send(event.plain_result("导入策略只能是：覆盖、累加、跳过"))
+            event.stop_event()
+            return
+        if not in_path.exists():
+            await event.send(event.plain_result(f"文件不存在：{in_path.name}"))
+            event.stop_event()
+            return
+        await event.send(event.plain_result("正在导入，请稍候..."))
+        try:
+            counts = await self.db.import_group(in_path, event.get_group_id(), IMPORT_POLICY_NAMES[policy_name])
+        except Exception as e:
+            logger.error(f"导入群数据失败: {e}")
+            await event.send(event.plain_result(f"导入失败：{e}"))
+            event.stop_event()
+            return
+        await event.send(event.plain_result(
+            f"导入完成（{policy_name}）：用户 {counts['users']} 条，禁言记录 {counts['mutes']} 条，购买记录 {counts['purchases']} 条"
+        ))
+        event.stop_event()
+
+    # ==================== 临时文件 ====================
+    async def handle_temp_usage(self, event: AiocqhttpMessageEvent):
+        usage = await asyncio.to_thread(self.temp_storage.usage)
+        await event.send(event.plain_result(
+            f"临时文件：{usage['files']} 个，共 {usage['bytes'] / 1024 / 1024:.1f}MB / 配额 {usage['quota_bytes'] // 1024 // 1024}MB\n"
+            f"进行中的工作区：{usage['active_workspaces']} 个，遗留工作区：{usage['idle_workspaces']} 个\n"
+            f"文件保留时间：{usage['ttl'] // 60} 分钟"
+        ))
+        event.stop_event()
+
+    async def handle_temp_sweep(self, event: AiocqhttpMessageEvent):
+        removed, freed = await asyncio.to_thread(self.temp_storage.sweep)
+        await event.send(event.plain_result(f"清理完成：删除 {removed} 项，释放 {freed / 1024 / 1024:.1f}MB"))
+        event.stop_event()
+
+    async def handle_cache_stats(self, event: AiocqhttpMessageEvent):
+        render = self.render_cache.stats()
+        avatar = self.avatar_cache.stats()
+        quote = self.quote_service.stats()
+        users = await self.db.stats()
+        layout = layout_cache_stats()
+        await event.send(event.plain_result(
+            f"用户缓存：{users['size']}/{users['capacity']} 条，命中 {users['hits']}，未命中 {users['misses']}，"
+            f"待提交写入 {users['pending']} 条\n"
+            f"图片缓存：{render['entries']} 张 / {render['bytes'] / 1024 / 1024:.1f}MB，"
+            f"命中 {render['hits']}（落盘 {render['disk_hits']}），未命中 {render['misses']}，合并 {render['coalesced']}\n"
+            f"排版缓存：整图排版 {layout['layouts']} 条，文字测量 {layout['measures']} 条\n"
+            f"头像缓存：内存 {avatar['memory_entries']} 张，内存命中 {avatar['memory_hits']}，磁盘命中 {avatar['disk_hits']}，"
+            f"未变化 {avatar['not_modified']}，下载 {avatar['downloads']}，失败 {avatar['failures']}\n"
+            f"一言：命中 {quote['hits']}，降级 {quote['misses']}，已获取 {quote['fetched']}，"
+            f"失败 {quote['failures']}，池中 {quote['pooled']} 条"
+        ))
+        event.stop_event()
+
     async def terminate(self):
         await self.curfew.stop_all_tasks()
-        logger.info("插件终止，宵禁任务已清理")
\ No newline at end of file
+        logger.info("插件终止，宵禁任务已清理")
+        self.temp_storage.stop()
+        self.members.stop()
+        await self.avatar_cache.close()
+        await self.quote_service.close()
+        self.render_pool.shutdown()
+        await self.db.close()
\ No newline at end of file
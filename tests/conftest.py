@@ -0,0 +1,76 @@
+# tests/conftest.py
+"""
+测试公共设置：把插件根目录加入 sys.path。
+未安装 AstrBot 时注册 coer 用到的最小 astrbot 模块（logger 和几个消息组件类型），
+只在测试进程内生效，已安装 AstrBot 时直接使用真实模块。
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+import types
+
+import pytest
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PLUGIN_DIR not in sys.path:
+    sys.path.insert(0, PLUGIN_DIR)
+
+try:
+    import astrbot.api  # noqa: F401
+except ImportError:
+    def _module(name: str, **attrs):
+        module = types.ModuleType(name)
+        module.__path__ = []
+        module.__dict__.update(attrs)
+        sys.modules[name] = module
+        return module
+
+    _module("astrbot")
+    _module("astrbot.api", logger=logging.getLogger("astrbot"))
+    _module("astrbot.core")
+    _module("astrbot.core.message")
+    _module("astrbot.core.message.components",
+            At=type("At", (), {}), Reply=type("Reply", (), {}), Image=type("Image", (), {}))
+    _module("astrbot.core.platform")
+    _module("astrbot.core.platform.sources")
+    _module("astrbot.core.platform.sources.aiocqhttp")
+    _module("astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event",
+            AiocqhttpMessageEvent=type("AiocqhttpMessageEvent", (), {}))
+
+
+class Ticker:
+    """每 10ms 醒一次的协程，记录两次唤醒之间的最大间隔，用来衡量事件循环是否被阻塞"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.ticks = 0
+        self.max_gap = 0.0
+        self._last = 0.0
+        self._task = None
+
+    def _tick(self):
+        now = time.perf_counter()
+        self.max_gap = max(self.max_gap, now - self._last)
+        self._last = now
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self._tick()
+            self.ticks += 1
+
+    def start(self):
+        self._last = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        # 停止时也计入最后一次唤醒之后的间隔，否则循环一直被阻塞到结束时测不到
+        self._tick()
+        self._task.cancel()
+
+
+@pytest.fixture
+def ticker() -> Ticker:
+    return Ticker()
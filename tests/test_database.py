@@ -0,0 +1,237 @@
+# tests/test_database.py
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from coer.data_manager import AsyncDatabase, Database
+
+
+def test_event_loop_keeps_serving_while_write_is_blocked(tmp_path, ticker):
+    path = tmp_path / "data.db"
+    adb = AsyncDatabase(Database(path))
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+
+    async def main():
+        ticker.start()
+        write = asyncio.create_task(adb.add_points("g1", "u1", 5))
+        await asyncio.sleep(0.5)
+        # 写锁被另一个连接占着，写入还在数据库线程里等待，事件循环照常运行
+        assert not write.done()
+        blocker.rollback()
+        await write
+        ticker.stop()
+        assert ticker.ticks >= 30
+        assert ticker.max_gap < 0.1
+        assert (await adb.get_user("g1", "u1"))["points"] == 5
+        await adb.close()
+
+    try:
+        asyncio.run(main())
+    finally:
+        blocker.close()
+
+
+def test_write_behind_drops_statement_that_can_never_succeed(tmp_path):
+    db = Database(tmp_path / "data.db", write_behind=True, batch_size=5)
+    db.get_user("g1", "u1")  # 放进缓存，验证缓存同步更新
+    # mutes.user_id 为 NOT NULL，这条永远无法写入
+    db.add_mute_record(None, "g1", "op", "", 60, 0, 60)
+    for _ in range(12):
+        # 缓冲区满时在调用内部提交，失败不能抛给调用方
+        db.add_points("g1", "u1", 1)
+    db.flush()
+    assert db._pending == []
+    assert db.get_user("g1", "u1")["points"] == 12
+    with db._lock:
+        db._user_cache.clear()
+    assert db.get_user("g1", "u1")["points"] == 12
+    assert db.get_latest_mute(None, "g1") is None
+    db.close()
+
+
+def test_write_behind_requeues_batch_while_database_is_locked(tmp_path):
+    path = tmp_path / "data.db"
+    db = Database(path, write_behind=True, batch_size=100)
+    db._conn.execute("PRAGMA busy_timeout=50")
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        db.add_points("g1", "u1", 3)
+        db.add_mute_record("u1", "g1", "op", "", 60, 0, 60)
+        assert db.flush() == 0
+        assert len(db._pending) == 2
+    finally:
+        blocker.rollback()
+        blocker.close()
+    assert db.flush() == 2
+    assert db.get_user("g1", "u1")["points"] == 3
+    db.close()
+
+
+def test_close_waits_for_lock_before_committing_buffered_writes(tmp_path):
+    path = tmp_path / "data.db"
+    db = Database(path, write_behind=True, batch_size=100)
+    db._conn.execute("PRAGMA busy_timeout=50")
+    blocker = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    blocker.execute("BEGIN IMMEDIATE")
+    db.add_mute_record("u1", "g1", "op", "", 60, 0, 60)
+    # 锁在关闭过程中才释放，close 要一直重试到缓冲区提交完
+    release = threading.Timer(0.3, blocker.rollback)
+    release.start()
+    try:
+        db.close(timeout=5)
+    finally:
+        release.join()
+        blocker.close()
+    reopened = Database(path)
+    assert reopened.get_latest_mute("u1", "g1") is not None
+    reopened.close()
+
+
+def test_close_drops_buffered_writes_after_timeout(tmp_path, caplog):
+    path = tmp_path / "data.db"
+    db = Database(path, write_behind=True, batch_size=100)
+    db._conn.execute("PRAGMA busy_timeout=50")
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    db.add_mute_record("u1", "g1", "op", "", 60, 0, 60)
+    try:
+        db.close(timeout=0.3)
+    finally:
+        blocker.rollback()
+        blocker.close()
+    assert db._pending == []
+    assert any(r.levelname == "ERROR" and "丢弃 1 条" in r.getMessage() for r in caplog.records)
+
+
+def test_user_without_row_is_not_ranked(tmp_path):
+    db = Database(tmp_path / "data.db")
+    assert db.get_user_rank("g1", "u1") == {"rank": None, "total": 0, "value": 0}
+    for i in range(10):
+        db.add_points("g1", f"u{i}", i + 1)
+    rank = db.get_user_rank("g1", "nobody", neighbours=True)
+    # 不能排在所有人后面（第 11 名 / 共 10 人）
+    assert rank == {"rank": None, "total": 10, "value": 0, "above": None, "below": None}
+    assert db.get_user_rank("g1", "u9")["rank"] == 1
+    # 积分为 0 但有数据的用户照常排名
+    db.update_user("g1", "zero", points=0)
+    assert db.get_user_rank("g1", "zero") == {"rank": 11, "total": 11, "value": 0}
+    db.close()
+
+
+def _query_plans(db: Database, call) -> str:
+    """执行 call，返回其中每条 SELECT 的 EXPLAIN QUERY PLAN 文本"""
+    statements = []
+    db._conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        db._conn.set_trace_callback(None)
+    plans = []
+    for sql in statements:
+        if sql.lstrip().upper().startswith("SELECT"):
+            plans += [row[-1] for row in db._conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    return "\n".join(plans)
+
+
+def test_queries_use_their_covering_indexes(tmp_path):
+    db = Database(tmp_path / "data.db")
+    for i in range(50):
+        db.add_points("g1", f"u{i}", i)
+        db.add_mute_record(f"u{i}", "g1", "op", "", 60, i, i + 60)
+        db.add_purchase(f"u{i}", 1)
+    cases = {
+        "idx_users_points": lambda: db.get_points_rank("g1", 10),
+        "idx_users_sign": lambda: db.get_sign_rank("g1", 10),
+        "idx_mutes_user": lambda: db.get_latest_mute("u1", "g1"),
+        "idx_purchases_user": lambda: db.get_user_purchases("u1", 1),
+    }
+    for index, call in cases.items():
+        plan = _query_plans(db, call)
+        assert index in plan, plan
+        assert "TEMP B-TREE" not in plan, plan
+    assert "idx_purchases_user" in _query_plans(db, lambda: db.get_user_purchases("u1"))
+    db.close()
+
+
+def _fill_group(db: Database, group_id: str, users: int):
+    with db._lock, db._conn as conn:
+        conn.executemany(
+            "INSERT INTO users (group_id, user_id, points, sign_count) VALUES (?, ?, ?, ?)",
+            [(group_id, f"u{i:06d}", i, i % 30) for i in range(users)]
+        )
+        conn.executemany(
+            "INSERT INTO mutes (user_id, group_id, operator, reason, duration, start_time, end_time) "
+            "VALUES (?, ?, 'op', '', 60, ?, ?)",
+            [(f"u{i:06d}", group_id, i, i + 60) for i in range(0, users, 10)]
+        )
+
+
+def test_export_and_import_let_other_requests_run_between_batches(tmp_path):
+    db = Database(tmp_path / "data.db")
+    _fill_group(db, "g1", 20000)
+    adb = AsyncDatabase(db)
+    path = tmp_path / "export.jsonl"
+    calls = {"read_group_page": 0, "import_rows": 0}
+    for name in calls:
+        original = getattr(db, name)
+
+        def counted(*args, _name=name, _original=original, **kwargs):
+            calls[_name] += 1
+            return _original(*args, **kwargs)
+        setattr(db, name, counted)
+
+    async def wait_for_calls(name: str, count: int):
+        while calls[name] < count:
+            await asyncio.sleep(0.001)
+
+    async def main():
+        export = asyncio.create_task(adb.export_group("g1", path, batch_size=500))
+        await wait_for_calls("read_group_page", 2)
+        # 导出进行中发起的查询不需要等整个导出结束
+        assert (await adb.get_user("g1", "u000005"))["points"] == 5
+        assert not export.done()
+        counts = await export
+        assert counts == {"users": 20000, "mutes": 2000, "purchases": 0}
+
+        imported = asyncio.create_task(adb.import_group(path, "g2", batch_size=500))
+        await wait_for_calls("import_rows", 2)
+        assert (await adb.get_user("g1", "u000007"))["points"] == 7
+        assert not imported.done()
+        assert await imported == counts
+        assert (await adb.get_user_rank("g2", "u019999"))["rank"] == 1
+        await adb.close()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("archive", [False, True])
+def test_mute_summary_survives_pruning(tmp_path, archive):
+    db = Database(tmp_path / "data.db")
+    now = int(time.time())
+    users = [f"u{i}" for i in range(10)]
+    for i in range(3000):
+        # 分布在最近 60 天内，保留 20 天时约三分之二会被清理
+        start = now - (i % 60) * 86400 - i
+        db.add_mute_record(users[i % len(users)], "g1" if i % 3 else "g2", "op", "刷屏", 60 + i % 7, start, start + 60)
+    before = {(g, u): db.get_mute_summary(g, u) for g in ("g1", "g2") for u in users}
+
+    archive_path = tmp_path / "mutes_archive.db" if archive else None
+    cutoff = now - 20 * 86400
+    pruned = 0
+    while True:
+        n = db.prune_mutes(cutoff, batch_size=250, archive_path=archive_path)
+        if not n:
+            break
+        pruned += n
+
+    assert pruned > 1500
+    assert db._conn.execute("SELECT COUNT(*) FROM mutes WHERE start_time < ?", (cutoff,)).fetchone()[0] == 0
+    assert {(g, u): db.get_mute_summary(g, u) for g in ("g1", "g2") for u in users} == before
+    if archive:
+        assert db._conn.execute("SELECT COUNT(*) FROM archive.mutes").fetchone()[0] == pruned
+    db.close()
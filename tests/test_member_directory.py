@@ -0,0 +1,68 @@
+# tests/test_member_directory.py
+import asyncio
+
+from coer.member_directory import MemberDirectory
+
+
+class FakeBot:
+    def __init__(self, members):
+        self.members = members
+        self.list_calls = 0
+
+    async def get_group_member_list(self, group_id: int):
+        self.list_calls += 1
+        return self.members
+
+
+class FakeEvent:
+    def __init__(self, bot: FakeBot):
+        self.bot = bot
+
+    def get_group_id(self) -> str:
+        return "10000"
+
+
+def test_find_by_name_matches_display_name_only():
+    bot = FakeBot([
+        {"user_id": 1, "card": "阿花", "nickname": "小明"},
+        {"user_id": 2, "card": "", "nickname": "小红"},
+        {"user_id": 3, "card": "小明", "nickname": "路人"},
+    ])
+    event = FakeEvent(bot)
+    members = MemberDirectory(ttl=600)
+
+    async def main():
+        # 1 号的昵称被群名片盖住了，“@小明” 只能匹配到群名片为小明的 3 号
+        assert await members.find_by_name(event, "小明") == ["3"]
+        assert await members.find_by_name(event, "阿花") == ["1"]
+        assert await members.find_by_name(event, "小红") == ["2"]
+        assert await members.find_by_name(event, "路人") == []
+
+        # 删掉群名片后显示名回到昵称
+        members.handle_notice({"notice_type": "group_card", "group_id": 10000, "user_id": 1, "card_new": ""})
+        assert await members.find_by_name(event, "阿花") == []
+        assert sorted(await members.find_by_name(event, "小明")) == ["1", "3"]
+        assert bot.list_calls == 1
+
+    asyncio.run(main())
+
+
+def test_directory_is_dropped_when_bot_leaves_group():
+    bot = FakeBot([{"user_id": 1, "card": "阿花", "nickname": "小明"}])
+    event = FakeEvent(bot)
+    members = MemberDirectory(ttl=600)
+
+    async def main():
+        assert await members.nickname(event, "1") == "阿花"
+        # 其他成员退群只删除该成员
+        members.handle_notice({"notice_type": "group_decrease", "sub_type": "leave",
+                               "group_id": 10000, "user_id": 2, "self_id": 99})
+        assert await members.nickname(event, "1") == "阿花"
+        assert bot.list_calls == 1
+
+        members.handle_notice({"notice_type": "group_decrease", "sub_type": "kick_me",
+                               "group_id": 10000, "user_id": 99, "self_id": 99})
+        assert await members.nickname(event, "1") == "阿花"
+        assert bot.list_calls == 2
+
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+# tests/test_nicknames.py
+import asyncio
+import time
+
+from coer.utils import NICKNAME_CONCURRENCY, get_nicknames
+
+
+class FakeBot:
+    """每次查询耗时 delay 秒；slow 中的成员永不返回，broken 中的成员抛异常"""
+
+    def __init__(self, delay: float = 0.1, slow=(), broken=()):
+        self.delay = delay
+        self.slow = {int(uid) for uid in slow}
+        self.broken = {int(uid) for uid in broken}
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def get_group_member_info(self, group_id: int, user_id: int, no_cache: bool = False):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            if user_id in self.slow:
+                await asyncio.sleep(3600)
+            await asyncio.sleep(self.delay)
+            if user_id in self.broken:
+                raise RuntimeError("member not found")
+            return {"card": f"名片{user_id}", "nickname": f"昵称{user_id}"}
+        finally:
+            self.in_flight -= 1
+
+
+class FakeEvent:
+    def __init__(self, bot: FakeBot):
+        self.bot = bot
+
+    def get_group_id(self) -> str:
+        return "10000"
+
+
+def test_nicknames_fan_out_with_bounded_concurrency():
+    bot = FakeBot(delay=0.1)
+    uids = [str(1000 + i) for i in range(20)]
+
+    start = time.perf_counter()
+    names = asyncio.run(get_nicknames(FakeEvent(bot), uids))
+    elapsed = time.perf_counter() - start
+
+    assert names == {uid: f"名片{uid}" for uid in uids}
+    assert bot.calls == 20
+    assert bot.peak == NICKNAME_CONCURRENCY
+    # 20 个查询按并发上限分批，约为 ceil(20 / 8) 轮，而不是逐个累加的 2 秒
+    rounds = -(-len(uids) // NICKNAME_CONCURRENCY)
+    assert rounds * 0.1 <= elapsed < rounds * 0.1 + 0.3
+
+
+def test_nicknames_fall_back_to_user_id_on_timeout_or_error():
+    bot = FakeBot(delay=0.05, slow=["2001"], broken=["2002"])
+    uids = ["2000", "2001", "2002", "2003"]
+
+    start = time.perf_counter()
+    names = asyncio.run(get_nicknames(FakeEvent(bot), uids, timeout=0.3))
+    elapsed = time.perf_counter() - start
+
+    assert names == {"2000": "名片2000", "2001": "2001", "2002": "2002", "2003": "名片2003"}
+    # 超时的查询只拖到自己的超时为止
+    assert elapsed < 0.6
+    assert bot.in_flight == 0
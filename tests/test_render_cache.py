@@ -0,0 +1,51 @@
+# tests/test_render_cache.py
+import asyncio
+
+import pytest
+
+from coer.render_cache import RenderCache
+
+
+def test_cancelling_first_request_does_not_cancel_coalesced_waiters():
+    cache = RenderCache()
+    renders = 0
+
+    async def render():
+        nonlocal renders
+        renders += 1
+        await asyncio.sleep(0.05)
+        return b"image"
+
+    async def main():
+        owner = asyncio.create_task(cache.get_or_render("menu", render))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_render("menu", render))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        # 发起渲染的请求被取消，合并进来的请求仍拿到同一次渲染的结果
+        assert await waiter == b"image"
+        assert await cache.get_or_render("menu", render) == b"image"
+        assert renders == 1
+        stats = cache.stats()
+        assert stats["coalesced"] == 1 and stats["hits"] == 1
+
+    asyncio.run(main())
+
+
+def test_failed_render_is_not_cached_and_reaches_every_waiter():
+    cache = RenderCache()
+
+    async def render():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("字体缺失")
+
+    async def main():
+        results = await asyncio.gather(*[cache.get_or_render("menu", render) for _ in range(3)],
+                                       return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert cache.stats()["entries"] == 0
+        assert await cache.get_or_render("menu", lambda: asyncio.sleep(0, b"ok")) == b"ok"
+
+    asyncio.run(main())
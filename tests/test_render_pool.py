@@ -0,0 +1,55 @@
+# tests/test_render_pool.py
+import asyncio
+import os
+
+from coer.rank_manager import RankImageGenerator
+from coer.render_cache import RenderCache
+from coer.render_pool import RenderPool
+from coer.temp_storage import TempStorage
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_event_loop_lag_stays_low_while_menus_render(tmp_path, ticker):
+    pool = RenderPool(workers=2, queue_size=16)
+    # 关闭渲染缓存，每张菜单都真正绘制一次
+    gen = RankImageGenerator(PLUGIN_DIR, str(tmp_path), "Basemap.png", "LXGWWenKai-Medium.ttf",
+                             render_pool=pool, render_cache=RenderCache(max_bytes=0),
+                             temp_storage=TempStorage(tmp_path / "temp"))
+    lines = [f"🔹 命令{i:02d} — 功能说明文字" for i in range(20)]
+
+    async def main():
+        ticker.start()
+        images = await asyncio.gather(*[
+            gen.create_menu_image(f"📋 功能菜单 {n}", lines, blur_radius=2) for n in range(20)
+        ])
+        ticker.stop()
+        assert all(isinstance(data, bytes) and data for data in images)
+        assert len(set(images)) == 20
+        # 单张菜单绘制约 100ms 以上；在事件循环里绘制时间隔会达到数秒
+        assert ticker.max_gap < 0.1, f"事件循环最大延迟 {ticker.max_gap * 1000:.0f}ms"
+
+    try:
+        asyncio.run(main())
+    finally:
+        pool.shutdown()
+
+
+def test_uncached_images_do_not_enter_the_render_cache(tmp_path):
+    pool = RenderPool(workers=1)
+    cache = RenderCache()
+    gen = RankImageGenerator(PLUGIN_DIR, str(tmp_path), "Basemap.png", "LXGWWenKai-Medium.ttf",
+                             render_pool=pool, render_cache=cache, temp_storage=TempStorage(tmp_path / "temp"))
+
+    async def main():
+        assert await gen.create_menu_image("签到成功", ["✅ 签到成功！", "获得积分：3"], cache=False)
+        assert cache.stats()["entries"] == 0
+        assert await gen.create_menu_image("📋 功能菜单", ["签到", "积分"])
+        assert await gen.create_menu_image("📋 功能菜单", ["签到", "积分"])
+        stats = cache.stats()
+        assert stats["entries"] == 1 and stats["hits"] == 1
+
+    try:
+        asyncio.run(main())
+    finally:
+        pool.shutdown()
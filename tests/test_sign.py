@@ -0,0 +1,36 @@
+# tests/test_sign.py
+import asyncio
+
+import pytest
+
+from coer.config import PluginConfig
+from coer.data_manager import AsyncDatabase, Database
+from coer.sign_manager import SignManager
+
+
+@pytest.mark.parametrize("write_behind", [False, True])
+@pytest.mark.parametrize("sign_mode", ["日期制", "24小时制"])
+def test_concurrent_sign_ins_succeed_exactly_once(tmp_path, write_behind, sign_mode):
+    config = PluginConfig(plugin_dir=tmp_path, data_dir=tmp_path, sign_mode=sign_mode, fixed_points=3)
+    adb = AsyncDatabase(Database(tmp_path / "data.db", write_behind=write_behind, batch_size=10))
+    sign = SignManager(adb, config)
+
+    async def main():
+        if write_behind:
+            adb.start_flush_loop(0.05)
+        results = await asyncio.gather(*[sign.process("g1", "u1") for _ in range(100)])
+        successes = [r for r in results if r[0]]
+        assert len(successes) == 1
+        assert successes[0][2] == 3
+        user = await adb.get_user("g1", "u1")
+        assert user["points"] == 3
+        assert user["sign_count"] == 1
+        assert user["continuous_days"] == 1
+        await adb.close()
+
+    asyncio.run(main())
+
+    # 关闭后重新打开，确认落盘的也只有一次签到
+    db = Database(tmp_path / "data.db")
+    assert db.get_user("g1", "u1")["sign_count"] == 1
+    db.close()
@@ -0,0 +1,38 @@
+# tests/test_temp_storage.py
+import os
+import time
+
+from coer.image_assets import write_output
+from coer.temp_storage import MIN_TEMP_TTL, TempStorage
+
+
+def test_periodic_sweep_keeps_fresh_tmp_files(tmp_path):
+    storage = TempStorage(tmp_path, ttl=0)
+    assert storage.ttl == MIN_TEMP_TTL
+    writing = tmp_path / "menu_abc.png.tmp"
+    writing.write_bytes(b"x" * 10)
+    stale = tmp_path / "old.png.tmp"
+    stale.write_bytes(b"x")
+    old = time.time() - MIN_TEMP_TTL - 10
+    os.utime(stale, (old, old))
+
+    # 运行中的清理不能删掉 write_output 正在写的文件，即使超出配额
+    storage.quota_bytes = 0
+    storage.sweep()
+    assert writing.exists()
+    assert not stale.exists()
+
+    # 启动时的 .tmp 都是上次运行中断留下的
+    storage.sweep(startup=True)
+    assert not writing.exists()
+
+
+def test_reused_output_file_survives_sweep(tmp_path):
+    storage = TempStorage(tmp_path, ttl=MIN_TEMP_TTL)
+    path = write_output(storage.output_dir, "menu", b"image")
+    old = time.time() - 7200
+    os.utime(path, (old, old))
+    # 缓存命中后再次交付同一张图片，文件要按新写入处理
+    assert write_output(storage.output_dir, "menu", b"image") == path
+    storage.sweep()
+    assert os.path.exists(path)